@@ -0,0 +1,6 @@
+# Copyright (c) 2022-2024 Linh Pham
+# mastodon-podcast-bot is released under the terms of the MIT License
+# SPDX-License-Identifier: MIT
+#
+# vim: set noai syntax=python ts=4 sw=4:
+"""Mastodon Podcast Feed Bot Benchmarks."""
@@ -0,0 +1,125 @@
+# Copyright (c) 2022-2024 Linh Pham
+# mastodon-podcast-bot is released under the terms of the MIT License
+# SPDX-License-Identifier: MIT
+#
+# vim: set noai syntax=python ts=4 sw=4:
+"""Episode De-duplication Benchmark Script.
+
+Compares looking up every stored GUID and enclosure URL for a feed with
+looking up only the GUIDs and enclosure URLs in the current feed batch,
+as the number of stored episodes grows.
+
+Run from the repository root: python -m benchmarks.dedup
+"""
+import sqlite3
+import tempfile
+import timeit
+from argparse import ArgumentParser, Namespace
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from sqlite3 import Connection
+
+from db import FeedDatabase
+
+_FEED_NAME: str = "benchmark"
+
+
+def command_parse() -> Namespace:
+    """Parse command arguments and options."""
+    parser: ArgumentParser = ArgumentParser(
+        description="Benchmark episode de-duplication against a growing feed database."
+    )
+    parser.add_argument(
+        "--history",
+        dest="history",
+        help="Comma-separated number of stored episodes to benchmark against",
+        type=str,
+        default="1000,10000,100000",
+    )
+    parser.add_argument(
+        "--batch-size",
+        dest="batch_size",
+        help="Number of episodes in each feed batch (default: 50)",
+        type=int,
+        default=50,
+    )
+    parser.add_argument(
+        "--repeat",
+        dest="repeat",
+        help="Number of timed runs for each history size (default: 5)",
+        type=int,
+        default=5,
+    )
+
+    return parser.parse_args()
+
+
+def populate_database(db_file: str, rows: int) -> None:
+    """Populate a feed database with a number of processed episodes."""
+    FeedDatabase(db_file)
+    database: Connection = sqlite3.connect(db_file)
+    processed: int = int(datetime.now().timestamp())
+    database.executemany(
+        "INSERT INTO episodes (podcast_name, guid, enclosure_url, processed) VALUES (?, ?, ?, ?)",
+        (
+            (_FEED_NAME, f"guid-{row}", f"https://example.org/{row}.mp3", processed)
+            for row in range(rows)
+        ),
+    )
+    database.commit()
+    database.close()
+
+
+def legacy_dedup(feed_database: FeedDatabase, guids: list[str], urls: list[str]) -> list[str]:
+    """De-duplicate a feed batch by loading every stored GUID and enclosure URL."""
+    seen_guids: list[str] = feed_database.retrieve_guids(feed_name=_FEED_NAME)
+    seen_urls: list[str] = feed_database.retrieve_enclosure_urls(feed_name=_FEED_NAME)
+    return [
+        guid for guid, url in zip(guids, urls) if guid not in seen_guids or url not in seen_urls
+    ]
+
+
+def candidate_dedup(feed_database: FeedDatabase, guids: list[str], urls: list[str]) -> list[str]:
+    """De-duplicate a feed batch by looking up only the batch candidates."""
+    unseen_guids, unseen_urls = feed_database.retrieve_unseen(
+        guids=guids, enclosure_urls=urls, feed_name=_FEED_NAME
+    )
+    return [guid for guid, url in zip(guids, urls) if guid in unseen_guids or url in unseen_urls]
+
+
+def _main() -> None:
+    """Script entry point."""
+    _command = command_parse()
+    print(f"{'history':>10} {'legacy (ms)':>12} {'candidate (ms)':>15}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for rows in (int(value) for value in _command.history.split(",")):
+            db_file: str = str(Path(temp_dir) / f"dedup_{rows}.sqlite3")
+            populate_database(db_file=db_file, rows=rows)
+            feed_database: FeedDatabase = FeedDatabase(db_file)
+
+            # Feed batch containing mostly seen episodes and a few new ones
+            batch: range = range(rows - _command.batch_size + 5, rows + 5)
+            guids: list[str] = [f"guid-{row}" for row in batch]
+            urls: list[str] = [f"https://example.org/{row}.mp3" for row in batch]
+
+            legacy: float = min(
+                timeit.repeat(
+                    partial(legacy_dedup, feed_database, guids, urls),
+                    number=1,
+                    repeat=_command.repeat,
+                )
+            )
+            candidate: float = min(
+                timeit.repeat(
+                    partial(candidate_dedup, feed_database, guids, urls),
+                    number=1,
+                    repeat=_command.repeat,
+                )
+            )
+            feed_database.connection.close()
+            print(f"{rows:>10} {legacy * 1000:>12.2f} {candidate * 1000:>15.2f}")
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,102 @@
+# Copyright (c) 2022-2024 Linh Pham
+# mastodon-podcast-bot is released under the terms of the MIT License
+# SPDX-License-Identifier: MIT
+#
+# vim: set noai syntax=python ts=4 sw=4:
+"""Episode Description Conversion Benchmark Script.
+
+Compares converting long HTML show notes to text in full and then
+truncating the text with converting only as much of the show notes as is
+needed for a post. Every converted description is checked against the
+full conversion before timing.
+
+Run from the repository root: python -m benchmarks.description
+"""
+import time
+from argparse import ArgumentParser, Namespace
+
+from benchmarks.synthetic import description_html, show_notes_html
+from render import PostRenderer, unsmart_quotes
+
+
+def command_parse() -> Namespace:
+    """Parse command arguments and options."""
+    parser: ArgumentParser = ArgumentParser(
+        description="Benchmark converting long HTML episode descriptions to post text."
+    )
+    parser.add_argument(
+        "--descriptions",
+        dest="descriptions",
+        help="Number of descriptions to convert for each run (default: 200)",
+        type=int,
+        default=200,
+    )
+    parser.add_argument(
+        "--size",
+        dest="size",
+        help="Approximate size of each HTML description, in characters (default: 40000)",
+        type=int,
+        default=40000,
+    )
+    parser.add_argument(
+        "--max-length",
+        dest="max_length",
+        help="Maximum length of the converted description (default: 275)",
+        type=int,
+        default=275,
+    )
+
+    return parser.parse_args()
+
+
+def full_description(renderer: PostRenderer, html: str, max_length: int = 275) -> str:
+    """Convert a whole description to text and then truncate it."""
+    text: str = renderer.html_to_text(unsmart_quotes(html)).replace(r"\+", "+")
+    if len(text) > max_length:
+        return f"{text[:max_length].strip()}...\n"
+
+    return f"{text.strip()}\n"
+
+
+def verify(renderer: PostRenderer, descriptions: list[str], max_length: int) -> None:
+    """Check that bounded conversion matches full conversion.
+
+    Short descriptions and a range of maximum lengths are also checked so
+    that truncation near chunk and text boundaries is covered.
+    """
+    samples: list[str] = descriptions[:5] + [description_html(number, 300) for number in range(5)]
+    for html in samples:
+        for length in (max_length, 1, 50, 120, 500, 1200, 5000, 100000):
+            expected: str = full_description(renderer, html, max_length=length)
+            if renderer.format_description(html, max_length=length) != expected:
+                raise SystemExit(f"Bounded conversion differs with max length {length}")
+
+
+def _main() -> None:
+    """Script entry point."""
+    _command = command_parse()
+    renderer: PostRenderer = PostRenderer()
+    descriptions: list[str] = [
+        show_notes_html(number, _command.size) for number in range(_command.descriptions)
+    ]
+    verify(renderer, descriptions, _command.max_length)
+
+    start: float = time.perf_counter()
+    for html in descriptions:
+        full_description(renderer, html, max_length=_command.max_length)
+    full: float = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for html in descriptions:
+        renderer.format_description(html, max_length=_command.max_length)
+    bounded: float = time.perf_counter() - start
+
+    print(f"{'full (ms/description)':>22} {'bounded (ms/description)':>25}")
+    print(
+        f"{full * 1000 / _command.descriptions:>22.3f} "
+        f"{bounded * 1000 / _command.descriptions:>25.3f}"
+    )
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,285 @@
+# Copyright (c) 2022-2024 Linh Pham
+# mastodon-podcast-bot is released under the terms of the MIT License
+# SPDX-License-Identifier: MIT
+#
+# vim: set noai syntax=python ts=4 sw=4:
+"""Feed Processing Pipeline Benchmark Script.
+
+Times each stage of processing a podcast feed, and an end-to-end run of
+main(), using synthetic feeds, feed databases and feeds settings files.
+Feeds are read from local files and posts are not sent to Mastodon, so
+no network access is required. Results are written as JSON so that they
+can be compared across commits.
+
+Run from the repository root: python -m benchmarks.pipeline
+"""
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser, Namespace
+from collections.abc import Callable
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Any
+from unittest import mock
+
+import podcast_bot
+from benchmarks import synthetic
+from config import AppConfig
+from db import FeedDatabase
+from feed import Episode, PodcastFeed
+from mastodon_client import MastodonClient, PostScheduler
+from render import PostRenderer
+
+_FEED_NAME: str = "feed-0"
+_RECENT_DAYS: int = 5
+
+
+def command_parse() -> Namespace:
+    """Parse command arguments and options."""
+    parser: ArgumentParser = ArgumentParser(
+        description="Benchmark each stage of the feed processing pipeline."
+    )
+    parser.add_argument(
+        "--episodes",
+        dest="episodes",
+        help="Number of episodes in each synthetic feed (default: 50)",
+        type=int,
+        default=50,
+    )
+    parser.add_argument(
+        "--description-size",
+        dest="description_size",
+        help="Approximate size of each episode HTML description (default: 2000)",
+        type=int,
+        default=2000,
+    )
+    parser.add_argument(
+        "--rows",
+        dest="rows",
+        help="Number of processed episodes stored for each feed (default: 10000)",
+        type=int,
+        default=10000,
+    )
+    parser.add_argument(
+        "--feeds",
+        dest="feeds",
+        help="Number of feeds in the feeds settings file (default: 10)",
+        type=int,
+        default=10,
+    )
+    parser.add_argument(
+        "--new-episodes",
+        dest="new_episodes",
+        help=f"Number of unseen episodes in each feed, up to {_RECENT_DAYS} (default: 3)",
+        type=int,
+        default=3,
+    )
+    parser.add_argument(
+        "--repeat",
+        dest="repeat",
+        help="Number of timed runs for each stage (default: 5)",
+        type=int,
+        default=5,
+    )
+    parser.add_argument(
+        "--output",
+        dest="output",
+        help="Write the JSON results to a file instead of stdout",
+        type=str,
+        default=None,
+    )
+
+    return parser.parse_args()
+
+
+def time_stage(
+    stage: Callable[[Any], Any], repeat: int, setup: Callable[[], Any] = None
+) -> dict[str, Any]:
+    """Time a benchmark stage, returning timings in milliseconds.
+
+    If provided, ``setup`` is called before each timed run and its return
+    value is passed to the stage.
+    """
+    timings: list[float] = []
+    for _ in range(repeat):
+        value: Any = setup() if setup else None
+        start: float = time.perf_counter()
+        stage(value)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "runs": repeat,
+        "min_ms": round(min(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "max_ms": round(max(timings), 3),
+    }
+
+
+def _commit() -> str | None:
+    """Returns the current Git commit hash, if available."""
+    result: subprocess.CompletedProcess = subprocess.run(  # noqa: S603
+        ["git", "rev-parse", "HEAD"],  # noqa: S607
+        cwd=Path(__file__).resolve().parent.parent,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    return result.stdout.strip() or None
+
+
+def _fresh_database(template_file: Path, db_file: Path) -> FeedDatabase:
+    """Returns a feed database opened from a copy of a template database."""
+    shutil.copyfile(template_file, db_file)
+    return FeedDatabase(str(db_file))
+
+
+def _retrieve_new_episodes(feed_database: FeedDatabase, episodes: list[Episode]) -> None:
+    """Run episode de-duplication and recording as a feed is processed."""
+    with feed_database.unit_of_work():
+        podcast_bot.retrieve_new_episodes(
+            feed_episodes=episodes,
+            feed_database=feed_database,
+            feed_name=_FEED_NAME,
+            days=_RECENT_DAYS,
+        )
+    feed_database.connection.close()
+
+
+def _clean(feed_database: FeedDatabase) -> None:
+    """Remove old episode entries from a feed database."""
+    feed_database.clean(days_to_keep=90)
+    feed_database.connection.close()
+
+
+def _format_posts(renderer: PostRenderer, episodes: list[Episode]) -> None:
+    """Format a post for each episode."""
+    for episode in episodes:
+        podcast_bot.format_post(episode=episode, podcast_name="Podcast 0", renderer=renderer)
+
+
+def _run_main(work_dir: Path, template_file: Path, db_file: Path) -> None:
+    """Run main() in the working directory against a copy of the template database."""
+    shutil.copyfile(template_file, db_file)
+    current_dir: Path = Path.cwd()
+    os.chdir(work_dir)
+    with (
+        mock.patch.object(sys, "argv", ["podcast_bot.py", "-m"]),
+        mock.patch.object(MastodonClient, "post", autospec=True),
+        mock.patch.object(
+            podcast_bot, "PostScheduler", partial(PostScheduler, min_interval=0, jitter=0)
+        ),
+    ):
+        try:
+            podcast_bot.main()
+        finally:
+            os.chdir(current_dir)
+
+
+def run_benchmarks(work_dir: Path, arguments: Namespace) -> dict[str, Any]:
+    """Generate synthetic data in a working directory and time each stage."""
+    new_episodes: int = min(arguments.new_episodes, _RECENT_DAYS)
+    template_file: Path = work_dir / "template.sqlite3"
+    db_file: Path = work_dir / "feed_info.sqlite3"
+    for number in range(arguments.feeds):
+        feed_name: str = f"feed-{number}"
+        (work_dir / f"{feed_name}.xml").write_bytes(
+            synthetic.rss_feed(
+                feed_name=feed_name,
+                episodes=arguments.episodes,
+                description_size=arguments.description_size,
+            )
+        )
+        synthetic.populate_database(
+            db_file=str(template_file),
+            rows=arguments.rows,
+            feed_name=feed_name,
+            start=arguments.episodes - new_episodes - arguments.rows,
+        )
+
+    synthetic.feeds_file(
+        path=str(work_dir / "feeds.json"),
+        feeds=arguments.feeds,
+        feed_url=f"{work_dir.as_uri()}/{{name}}.xml",
+        settings={
+            "database_file": str(db_file),
+            "log_file": str(work_dir / "podcast_bot.log"),
+            "recent_days": _RECENT_DAYS,
+            "template_directory": str(Path("templates").resolve()),
+        },
+    )
+
+    feed_url: str = (work_dir / f"{_FEED_NAME}.xml").as_uri()
+    episodes: list[Episode] = PodcastFeed().fetch(
+        feed_url=feed_url, max_episodes=arguments.episodes
+    )
+    renderer: PostRenderer = PostRenderer()
+    fresh_database: partial = partial(_fresh_database, template_file, db_file)
+    new: list[Episode] = podcast_bot.retrieve_new_episodes(
+        feed_episodes=episodes,
+        feed_database=fresh_database(),
+        feed_name=_FEED_NAME,
+        days=_RECENT_DAYS,
+        dry_run=True,
+    )
+
+    return {
+        "fetch_parse": time_stage(
+            lambda _: PodcastFeed().fetch(feed_url=feed_url, max_episodes=arguments.episodes),
+            repeat=arguments.repeat,
+        ),
+        "retrieve_new_episodes": time_stage(
+            partial(_retrieve_new_episodes, episodes=episodes),
+            repeat=arguments.repeat,
+            setup=fresh_database,
+        ),
+        "format_post": time_stage(lambda _: _format_posts(renderer, new), repeat=arguments.repeat),
+        "database_clean": time_stage(_clean, repeat=arguments.repeat, setup=fresh_database),
+        "config_parse": time_stage(
+            lambda _: AppConfig().parse(str(work_dir / "feeds.json")), repeat=arguments.repeat
+        ),
+        "main": time_stage(
+            lambda _: _run_main(work_dir, template_file, db_file), repeat=arguments.repeat
+        ),
+    }
+
+
+def _main() -> None:
+    """Script entry point."""
+    _command = command_parse()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        stages: dict[str, Any] = run_benchmarks(Path(temp_dir), _command)
+
+    results: dict[str, Any] = {
+        "benchmark": "pipeline",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {
+            "episodes": _command.episodes,
+            "description_size": _command.description_size,
+            "rows": _command.rows,
+            "feeds": _command.feeds,
+            "new_episodes": min(_command.new_episodes, _RECENT_DAYS),
+            "repeat": _command.repeat,
+        },
+        "stages": stages,
+    }
+
+    if _command.output:
+        with Path(_command.output).open(mode="w", encoding="utf-8") as output_file:
+            json.dump(results, output_file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,118 @@
+# Copyright (c) 2022-2024 Linh Pham
+# mastodon-podcast-bot is released under the terms of the MIT License
+# SPDX-License-Identifier: MIT
+#
+# vim: set noai syntax=python ts=4 sw=4:
+"""Post Rendering Benchmark Script.
+
+Compares the number of posts rendered per second when a new Jinja
+environment and template are created for every post with rendering
+through a cached post renderer.
+
+Run from the repository root: python -m benchmarks.render
+"""
+import time
+from argparse import ArgumentParser, Namespace
+from datetime import datetime
+
+from html2text import HTML2Text
+from jinja2 import Environment, FileSystemLoader, Template, select_autoescape
+
+from feed import Episode
+from podcast_bot import format_post
+from render import PostRenderer, unsmart_quotes
+
+
+def command_parse() -> Namespace:
+    """Parse command arguments and options."""
+    parser: ArgumentParser = ArgumentParser(
+        description="Benchmark the number of posts rendered per second."
+    )
+    parser.add_argument(
+        "--posts",
+        dest="posts",
+        help="Number of posts to render for each run (default: 2000)",
+        type=int,
+        default=2000,
+    )
+    parser.add_argument(
+        "--template-cache",
+        dest="template_cache",
+        help="Directory used to cache compiled templates",
+        type=str,
+        default=None,
+    )
+
+    return parser.parse_args()
+
+
+def uncached_format_post(episode: Episode, podcast_name: str = None) -> str:
+    """Format a post by creating a new environment, template and formatter."""
+    formatter: HTML2Text = HTML2Text()
+    formatter.ignore_emphasis = True
+    formatter.ignore_images = True
+    formatter.ignore_links = True
+    formatter.ignore_tables = True
+    formatter.body_width = 0
+
+    env: Environment = Environment(
+        loader=FileSystemLoader("templates"),
+        autoescape=select_autoescape(),
+        trim_blocks=True,
+        lstrip_blocks=True,
+    )
+    template: Template = env.get_template("post.txt.jinja")
+
+    title: str = unsmart_quotes(text=episode.title)
+    description: str = unsmart_quotes(text=episode.description)
+    formatted_description: str = formatter.handle(description).replace(r"\+", "+")
+    if len(formatted_description) > 275:
+        formatted_description = f"{formatted_description[:275].strip()}...\n"
+    else:
+        formatted_description = f"{formatted_description.strip()}\n"
+
+    return template.render(
+        podcast_name=podcast_name,
+        title=title,
+        description=formatted_description,
+        url=episode.url,
+    )
+
+
+def _episode(number: int) -> Episode:
+    """Returns a synthetic episode."""
+    return Episode(
+        guid=f"guid-{number}",
+        published=int(datetime.now().timestamp()),
+        title=f"Episode {number}: “Benchmarks” and You",
+        duration=45 * 60,
+        url=f"https://example.org/episodes/{number}.mp3",
+        description=(
+            f"<p>In episode {number}, we talk about <b>benchmarks</b> and 1+1.</p>"
+            "<ul><li>First topic</li><li>Second topic</li></ul>" + "<p>Lorem ipsum.</p>" * 10
+        ),
+    )
+
+
+def _main() -> None:
+    """Script entry point."""
+    _command = command_parse()
+    episodes: list[Episode] = [_episode(number) for number in range(_command.posts)]
+
+    start: float = time.perf_counter()
+    for episode in episodes:
+        uncached_format_post(episode=episode, podcast_name="Benchmark Podcast")
+    uncached: float = time.perf_counter() - start
+
+    start = time.perf_counter()
+    renderer: PostRenderer = PostRenderer(bytecode_cache_directory=_command.template_cache)
+    for episode in episodes:
+        format_post(episode=episode, podcast_name="Benchmark Podcast", renderer=renderer)
+    cached: float = time.perf_counter() - start
+
+    print(f"{'uncached (posts/s)':>20} {'cached (posts/s)':>18}")
+    print(f"{_command.posts / uncached:>20.0f} {_command.posts / cached:>18.0f}")
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,99 @@
+# Copyright (c) 2022-2024 Linh Pham
+# mastodon-podcast-bot is released under the terms of the MIT License
+# SPDX-License-Identifier: MIT
+#
+# vim: set noai syntax=python ts=4 sw=4:
+"""Start-up Import Time Benchmark Script.
+
+Measures the cumulative import time of the podcast_bot module using the
+Python -X importtime option and exits with an error if it exceeds the
+budget, or if any module that should only be imported when needed is
+imported at start-up.
+
+Run from the repository root: python -m benchmarks.startup
+"""
+import subprocess
+import sys
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+
+# Modules that are only needed once a feed is parsed or a post is made
+_DEFERRED_MODULES: tuple[str, ...] = (
+    "html2text",
+    "jinja2",
+    "mastodon",
+    "podcastparser",
+    "sqlite3",
+    "urllib.request",
+)
+
+
+def command_parse() -> Namespace:
+    """Parse command arguments and options."""
+    parser: ArgumentParser = ArgumentParser(
+        description="Benchmark podcast_bot start-up import time against a budget."
+    )
+    parser.add_argument(
+        "--budget",
+        dest="budget",
+        help="Maximum cumulative import time of podcast_bot in milliseconds (default: 100)",
+        type=float,
+        default=100.0,
+    )
+    parser.add_argument(
+        "--repeat",
+        dest="repeat",
+        help="Number of interpreter start-ups to measure (default: 5)",
+        type=int,
+        default=5,
+    )
+
+    return parser.parse_args()
+
+
+def measure_imports() -> dict[str, int]:
+    """Returns the cumulative import time, in microseconds, of each imported module."""
+    result: subprocess.CompletedProcess = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", "import podcast_bot"],
+        cwd=Path(__file__).resolve().parent.parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    imports: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+
+        _, cumulative, module = line.split("|")
+        if cumulative.strip().isdigit():
+            imports[module.strip()] = int(cumulative)
+
+    return imports
+
+
+def _main() -> None:
+    """Script entry point."""
+    _command = command_parse()
+    runs: list[dict[str, int]] = [measure_imports() for _ in range(_command.repeat)]
+    startup: float = min(run["podcast_bot"] for run in runs) / 1000
+
+    deferred: list[str] = sorted(module for module in _DEFERRED_MODULES if module in runs[0])
+    print(f"podcast_bot import time: {startup:.1f} ms (budget: {_command.budget:.1f} ms)")
+
+    failed: bool = False
+    if startup > _command.budget:
+        print("ERROR: Start-up import time exceeds the budget.")
+        failed = True
+
+    if deferred:
+        print(f"ERROR: Modules imported at start-up: {', '.join(deferred)}")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _main()
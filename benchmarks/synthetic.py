@@ -0,0 +1,184 @@
+# Copyright (c) 2022-2024 Linh Pham
+# mastodon-podcast-bot is released under the terms of the MIT License
+# SPDX-License-Identifier: MIT
+#
+# vim: set noai syntax=python ts=4 sw=4:
+"""Synthetic Benchmark Data Module.
+
+Generates podcast RSS feeds, pre-populated feed databases and feeds
+settings files used by the benchmark scripts.
+"""
+import json
+import sqlite3
+from datetime import datetime, timedelta
+from email.utils import format_datetime
+from pathlib import Path
+from sqlite3 import Connection
+from typing import Any
+from xml.sax.saxutils import escape
+
+from db import FeedDatabase
+
+_PARAGRAPH: str = (
+    "<p>In this episode, we talk about <b>benchmarks</b>, <i>profiling</i> and why "
+    "1+1 doesn’t always equal 2. Read more at "
+    '<a href="https://example.org/notes">the show notes</a>.</p>'
+)
+
+
+def episode_guid(feed_name: str, number: int) -> str:
+    """Returns the GUID of a synthetic episode."""
+    return f"{feed_name}-guid-{number}"
+
+
+def episode_url(feed_name: str, number: int) -> str:
+    """Returns the enclosure URL of a synthetic episode."""
+    return f"https://example.org/{feed_name}/{number}.mp3"
+
+
+def description_html(number: int, size: int = 2000) -> str:
+    """Returns an HTML episode description of roughly ``size`` characters."""
+    paragraphs: int = max(1, size // len(_PARAGRAPH))
+    return (
+        f"<p>Episode {number} “show notes”:</p>"
+        "<ul><li>First topic</li><li>Second topic</li></ul>" + _PARAGRAPH * paragraphs
+    )
+
+
+def show_notes_html(number: int, size: int = 40000) -> str:
+    """Returns long HTML show notes of roughly ``size`` characters.
+
+    The show notes follow the layout of show notes from large podcast
+    networks: a short summary, chapter timestamps, sponsor blocks full of
+    links and tracking images, credits and a long legal footer.
+    """
+    summary: str = (
+        f"<p>Episode {number}: this week we dig into “benchmarks”, what the numbers "
+        "don’t tell you &amp; why C++ and 1+1 keep coming up.&nbsp;Plus, listener "
+        "mail!</p><p><br></p>"
+    )
+    chapters: str = (
+        "<ul>"
+        + "".join(
+            f"<li>({minute:02d}:00) Segment {minute} &ndash; "
+            f'<a href="https://example.org/{number}/{minute}">notes</a></li>'
+            for minute in range(0, 60, 5)
+        )
+        + "</ul>"
+    )
+    sponsor: str = (
+        '<div class="sponsor"><p><strong>Sponsors:</strong></p><p>Go to '
+        '<a href="https://example.org/sponsor?utm_source=podcast&amp;utm_medium=audio">'
+        "example.org/sponsor</a> and use code <em>BENCH</em> for 20% off.&nbsp;"
+        '<img src="https://example.org/pixel.gif" width="1" height="1" alt=""></p>'
+        "<table><tr><td>Offer</td><td>Terms apply</td></tr></table></div>"
+    )
+    footer: str = (
+        "<p><small>Learn more about your ad choices. Visit "
+        '<a href="https://example.org/adchoices">example.org/adchoices</a>. '
+        "Privacy policy &copy; Example Media, all rights reserved.</small></p>"
+    )
+    html: str = summary + chapters
+    while len(html) < size:
+        html += sponsor + _PARAGRAPH + footer
+
+    return html
+
+
+def rss_feed(
+    feed_name: str = "benchmark",
+    episodes: int = 50,
+    description_size: int = 2000,
+    interval: timedelta = timedelta(days=1),
+) -> bytes:
+    """Returns a podcast RSS feed with ``episodes`` episodes, newest first.
+
+    The newest episode is published an hour ago and each older episode is
+    published ``interval`` before the next.
+    """
+    newest: datetime = datetime.now().astimezone() - timedelta(hours=1)
+    items: list[str] = []
+    for number in range(episodes - 1, -1, -1):
+        published: datetime = newest - interval * (episodes - 1 - number)
+        items.append(
+            "<item>"
+            f"<title>Episode {number}: “Benchmarks” and You</title>"
+            f'<guid isPermaLink="false">{episode_guid(feed_name, number)}</guid>'
+            f"<pubDate>{format_datetime(published)}</pubDate>"
+            "<itunes:duration>00:45:00</itunes:duration>"
+            f"<description>{escape(description_html(number, description_size))}</description>"
+            f'<enclosure url="{episode_url(feed_name, number)}" length="1000" '
+            'type="audio/mpeg"/>'
+            "</item>"
+        )
+
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<rss version="2.0" xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd">'
+        f"<channel><title>{feed_name}</title><link>https://example.org/{feed_name}</link>"
+        f"<description>Synthetic podcast feed</description>{''.join(items)}</channel></rss>"
+    ).encode()
+
+
+def populate_database(
+    db_file: str,
+    rows: int,
+    feed_name: str = "benchmark",
+    start: int = 0,
+    processed_after: datetime = None,
+) -> None:
+    """Add ``rows`` processed episodes to a feed database.
+
+    Episode numbers run from ``start`` to ``start + rows - 1``, using the same GUIDs and
+    enclosure URLs as the episodes in a synthetic feed with the same name.
+    Processed timestamps are spread evenly from ``processed_after`` (default:
+    one year ago) until now.
+    """
+    FeedDatabase(db_file).connection.close()
+    now: datetime = datetime.now()
+    if not processed_after:
+        processed_after = now - timedelta(days=365)
+
+    step: timedelta = (now - processed_after) / max(rows, 1)
+    database: Connection = sqlite3.connect(db_file)
+    database.executemany(
+        "INSERT INTO episodes (podcast_name, guid, enclosure_url, processed) VALUES (?, ?, ?, ?)",
+        (
+            (
+                feed_name,
+                episode_guid(feed_name, start + row),
+                episode_url(feed_name, start + row),
+                int((processed_after + step * row).timestamp()),
+            )
+            for row in range(rows)
+        ),
+    )
+    database.commit()
+    database.close()
+
+
+def feeds_file(
+    path: str,
+    feeds: int,
+    feed_url: str = "https://example.org/feed.xml",
+    settings: dict[str, Any] = None,
+) -> None:
+    """Write a feeds settings file containing ``feeds`` feeds.
+
+    Each feed is named ``feed-<number>`` and uses ``feed_url``, which may
+    contain a ``{name}`` placeholder. Any additional settings are applied
+    to every feed.
+    """
+    feeds_settings: list[dict[str, Any]] = [
+        {
+            "feed_name": f"feed-{number}",
+            "podcast_name": f"Podcast {number}",
+            "podcast_feed_url": feed_url.format(name=f"feed-{number}"),
+            "mastodon_api_base_url": "https://mastodon.example.org",
+            "mastodon_secrets_file": "benchmark.secret",
+            **(settings or {}),
+        }
+        for number in range(feeds)
+    ]
+    with Path(path).open(mode="w", encoding="utf-8") as _feeds_file:
+        json.dump(feeds_settings, _feeds_file, indent=2)
@@ -4,7 +4,20 @@
 #
 # vim: set noai syntax=python ts=4 sw=4:
 """Application Command-Line Parsing Module."""
-from argparse import ArgumentParser, Namespace
+from argparse import ArgumentParser, ArgumentTypeError, Namespace
+
+
+def shard(value: str) -> tuple[int, int]:
+    """Parse a shard in the form INDEX/COUNT, with shards numbered from 0."""
+    try:
+        shard_index, shard_count = (int(part) for part in value.split("/"))
+    except ValueError as error:
+        raise ArgumentTypeError(f"invalid shard {value!r}, expected INDEX/COUNT") from error
+
+    if shard_count < 1 or not 0 <= shard_index < shard_count:
+        raise ArgumentTypeError(f"invalid shard {value!r}, INDEX must be from 0 to COUNT - 1")
+
+    return shard_index, shard_count
 
 
 class AppCommand:
@@ -36,6 +49,143 @@ class AppCommand:
             default="feeds.json",
             help="Podcast feeds settings file (default: feeds.json)",
         )
+        parser.add_argument(
+            "--feed",
+            dest="feed_names",
+            action="append",
+            default=None,
+            help="Only process the named feed. Shell-style patterns, such as news-*, "
+            "are supported. Can be repeated",
+        )
+        parser.add_argument(
+            "--tag",
+            dest="feed_tags",
+            action="append",
+            default=None,
+            help="Only process feeds with the tag. Can be repeated",
+        )
+        parser.add_argument(
+            "--config-cache",
+            type=str,
+            default=None,
+            help="File used to cache validated feeds settings between runs",
+        )
+        parser.add_argument(
+            "--fetch-workers",
+            type=int,
+            default=4,
+            help="Number of podcast feeds to fetch concurrently (default: 4)",
+        )
+        parser.add_argument(
+            "--fetch-per-host",
+            type=int,
+            default=2,
+            help="Maximum number of concurrent fetches per feed host (default: 2)",
+        )
+        parser.add_argument(
+            "--template-cache",
+            type=str,
+            default=None,
+            help="Directory used to cache compiled post templates between runs",
+        )
+        parser.add_argument(
+            "--pool-size",
+            type=int,
+            default=2,
+            help="Maximum number of idle keep-alive connections kept for each feed host "
+            "(default: 2)",
+        )
+        parser.add_argument(
+            "--pool-idle-timeout",
+            type=float,
+            default=60.0,
+            help="Number of seconds an idle keep-alive connection is kept before it is "
+            "closed (default: 60)",
+        )
+        parser.add_argument(
+            "--connect-timeout",
+            type=float,
+            default=10.0,
+            help="Number of seconds to wait when connecting to a feed host (default: 10)",
+        )
+        parser.add_argument(
+            "--read-timeout",
+            type=float,
+            default=30.0,
+            help="Number of seconds to wait for data from a feed host (default: 30)",
+        )
+        parser.add_argument(
+            "--feed-timeout",
+            type=float,
+            default=120.0,
+            help="Maximum number of seconds taken to fetch a feed (default: 120)",
+        )
+        parser.add_argument(
+            "--breaker-failures",
+            type=int,
+            default=3,
+            help="Number of consecutive failed fetches from a feed host before fetches "
+            "from the host are stopped (default: 3)",
+        )
+        parser.add_argument(
+            "--breaker-reset",
+            type=float,
+            default=300.0,
+            help="Number of seconds before a feed host with stopped fetches is tried "
+            "again (default: 300)",
+        )
+        parser.add_argument(
+            "--shard",
+            type=shard,
+            default=None,
+            metavar="INDEX/COUNT",
+            help="Only process feeds assigned to this shard, numbered from 0, out of COUNT "
+            "shards. Feeds are assigned to shards using a hash of the feed name",
+        )
+        parser.add_argument(
+            "--lease-db",
+            type=str,
+            default=None,
+            help="Shared database file used to hold leases on feeds, so that a feed is "
+            "only processed by one worker at a time",
+        )
+        parser.add_argument(
+            "--lease-ttl",
+            type=float,
+            default=600.0,
+            help="Number of seconds a lease on a feed is held without being renewed "
+            "(default: 600)",
+        )
+        parser.add_argument(
+            "--worker-id",
+            type=str,
+            default=None,
+            help="Worker name used to hold leases on feeds (default: host name and process ID)",
+        )
+        parser.add_argument(
+            "--episode-cache",
+            type=str,
+            default=None,
+            help="Directory used to cache parsed episodes by feed content, for dry runs "
+            "and debugging",
+        )
+        parser.add_argument(
+            "--daemon",
+            action="store_true",
+            help="Keep running and poll feeds using adaptive per-feed polling intervals",
+        )
+        parser.add_argument(
+            "--metrics-file",
+            type=str,
+            default=None,
+            help="Write per-feed metrics to a Prometheus textfile collector file",
+        )
+        parser.add_argument(
+            "--report-file",
+            type=str,
+            default=None,
+            help="Write per-feed metrics to a JSON run report file",
+        )
         parser.add_argument("--debug", action="store_true", help="Enable debug output to stdout")
         parser.add_argument(
             "--skip-clean",
@@ -4,10 +4,13 @@
 #
 # vim: set noai syntax=python ts=4 sw=4:
 """Application Configuration Module."""
+import hashlib
 import json
+import pickle
 import sys
+from fnmatch import fnmatchcase
 from pathlib import Path
-from typing import NamedTuple
+from typing import Any, NamedTuple
 
 from dotenv import dotenv_values
 
@@ -27,6 +30,8 @@ class FeedSettings(NamedTuple):
     mastodon_access_token: str = None
     database_file: str = "feed_info.sqlite3"
     database_clean_days: int = 90
+    database_wal_mode: bool = False
+    database_busy_timeout: float = 5.0
     log_file: str = "logs/podcast_bot.log"
     recent_days: int = 5
     max_episodes: int = 50
@@ -36,14 +41,136 @@ class FeedSettings(NamedTuple):
     template_directory: str = "templates"
     template_file: str = "post.txt.jinja"
     enabled: bool = True
+    bounded_parse: bool = False
+    min_poll_interval: int = 300
+    max_poll_interval: int = 21600
+    tags: tuple[str, ...] = ()
+
+
+def feed_shard(feed_name: str, shard_count: int) -> int:
+    """Returns the shard a feed is assigned to out of ``shard_count`` shards.
+
+    The shard is based on a hash of the feed name, so a feed is assigned
+    to the same shard by every worker and across restarts.
+    """
+    digest: bytes = hashlib.sha256(feed_name.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shard_count
+
+
+class FeedIndex:
+    """Podcast Feed Settings Index.
+
+    Looks up feeds by name, shell-style name pattern or tag. Selected
+    feeds are returned in the same order as in the feeds settings.
+    """
+
+    def __init__(self, feeds: list[FeedSettings]) -> None:
+        """Class initialization method."""
+        self.feeds: list[FeedSettings] = feeds
+        self.names: dict[str, list[int]] = {}
+        self.tags: dict[str, list[int]] = {}
+        for index, feed in enumerate(feeds):
+            self.names.setdefault(feed.name, []).append(index)
+            for tag in feed.tags:
+                self.tags.setdefault(tag, []).append(index)
+
+    def select(self, names: list[str] = None, tags: list[str] = None) -> list[FeedSettings]:
+        """Returns feeds matching any of the names, name patterns or tags.
+
+        All feeds are returned if no names or tags are provided.
+        """
+        if not names and not tags:
+            return self.feeds
+
+        selected: set[int] = set()
+        for name in names or []:
+            if any(character in name for character in "*?["):
+                for feed_name, indexes in self.names.items():
+                    if fnmatchcase(feed_name, name):
+                        selected.update(indexes)
+            else:
+                selected.update(self.names.get(name, []))
+
+        for tag in tags or []:
+            selected.update(self.tags.get(tag, []))
+
+        return [self.feeds[index] for index in sorted(selected)]
+
+    def shard(self, shard_index: int, shard_count: int) -> list[FeedSettings]:
+        """Returns feeds assigned to a shard, numbered from 0, out of ``shard_count`` shards."""
+        return [feed for feed in self.feeds if feed_shard(feed.name, shard_count) == shard_index]
+
+    def __str__(self) -> str:
+        return self.__class__.__name__
+
+
+class _CacheUnpickler(pickle.Unpickler):
+    """Feeds settings cache unpickler that only loads built-in values."""
+
+    def find_class(self, module: str, name: str) -> Any:
+        raise pickle.UnpicklingError(f"Feeds settings cache cannot contain {module}.{name}")
 
 
 class AppConfig:
     """Application podcast feeds settings."""
 
-    def parse(self, feeds_file: str = "feeds.json") -> list[FeedSettings]:
-        """Parse podcast feeds settings."""
+    def _cache_key(self, feeds_path: Path) -> dict[str, Any]:
+        """Returns the values used to check whether a settings cache is current."""
+        stat = feeds_path.stat()
+        return {
+            "feeds_file": str(feeds_path.resolve()),
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "fields": list(FeedSettings._fields),
+        }
+
+    def _load_cache(self, cache_file: str, key: dict[str, Any]) -> list[FeedSettings] | None:
+        """Load validated feeds settings from a cache file, if the cache is current."""
+        cache_path: Path = Path(cache_file)
+        if not cache_path.exists():
+            return None
+
+        try:
+            with cache_path.open(mode="rb") as _cache_file:
+                cache_key, feeds = _CacheUnpickler(_cache_file).load()
+        except (OSError, ValueError, TypeError, EOFError, pickle.UnpicklingError):
+            return None
+
+        if cache_key != key:
+            return None
+
+        return [FeedSettings._make(feed) for feed in feeds]
+
+    def _write_cache(
+        self, cache_file: str, key: dict[str, Any], feeds_settings: list[FeedSettings]
+    ) -> None:
+        """Write validated feeds settings to a cache file.
+
+        Settings are stored as plain tuples so that loading the cache does
+        not require importing or constructing any other objects.
+        """
+        cache_path: Path = Path(cache_file)
+        temp_path: Path = cache_path.with_name(f".{cache_path.name}.tmp")
+        temp_path.write_bytes(
+            pickle.dumps((key, [tuple(feed) for feed in feeds_settings]), protocol=5)
+        )
+        temp_path.replace(cache_path)
+
+    def parse(self, feeds_file: str = "feeds.json", cache_file: str = None) -> list[FeedSettings]:
+        """Parse podcast feeds settings.
+
+        If a cache file is provided, validated settings are loaded from the
+        cache file when the feeds settings file's modification time and
+        size have not changed, and are written to the cache file otherwise.
+        """
         feeds_path = Path.cwd() / feeds_file
+        cache_key: dict[str, Any] | None = None
+        if cache_file and feeds_path.exists():
+            cache_key = self._cache_key(feeds_path)
+            cached_settings: list[FeedSettings] | None = self._load_cache(cache_file, cache_key)
+            if cached_settings is not None:
+                return cached_settings
+
         with feeds_path.open(mode="r", encoding="utf-8") as _feeds_file:
             feeds = json.load(_feeds_file)
             if not feeds:
@@ -89,6 +216,11 @@ class AppConfig:
             ):
                 print("ERROR: Mastodon client secret or access token setting not found.")
 
+            tags: list[Any] = feed.get("tags", [])
+            if not isinstance(tags, list):
+                print("ERROR: Feed tags setting must be a list of tags.")
+                sys.exit(1)
+
             feed_settings = FeedSettings(
                 name=feed["feed_name"].strip(),
                 podcast_name=feed["podcast_name"].strip(),
@@ -101,6 +233,8 @@ class AppConfig:
                 mastodon_api_base_url=feed.get("mastodon_api_base_url", "").strip(),
                 database_file=feed.get("database_file", "feed_info.sqlite3").strip(),
                 database_clean_days=int(feed.get("database_clean_days", 90)),
+                database_wal_mode=bool(feed.get("database_wal_mode", False)),
+                database_busy_timeout=float(feed.get("database_busy_timeout", 5.0)),
                 log_file=feed.get("log_file", "logs/podcast_bot.log").strip(),
                 recent_days=int(feed.get("recent_days", 90)),
                 max_episodes=int(feed.get("max_episodes", 50)),
@@ -109,9 +243,16 @@ class AppConfig:
                 user_agent=feed.get("user_agent", _DEFAULT_USER_AGENT).strip(),
                 template_directory=feed.get("template_directory", "templates").strip(),
                 template_file=feed.get("template_file", "post.txt.jinja").strip(),
+                bounded_parse=bool(feed.get("bounded_parse", False)),
+                min_poll_interval=int(feed.get("min_poll_interval", 300)),
+                max_poll_interval=int(feed.get("max_poll_interval", 21600)),
+                tags=tuple(str(tag).strip() for tag in tags),
             )
             feeds_settings.append(feed_settings)
 
+        if cache_key:
+            self._write_cache(cache_file, cache_key, feeds_settings)
+
         return feeds_settings
 
     def __str__(self) -> str:
@@ -167,6 +308,8 @@ class AppEnvironment:
             mastodon_api_base_url=dotenv_config.get("MASTODON_API_BASE_URL", "").strip(),
             database_file=dotenv_config.get("DB_FILE", "feed_info.sqlite3").strip(),
             database_clean_days=int(dotenv_config.get("DB_CLEAN_DAYS", 90)),
+            database_wal_mode=dotenv_config.get("DB_WAL_MODE", "false").strip().lower() == "true",
+            database_busy_timeout=float(dotenv_config.get("DB_BUSY_TIMEOUT", 5.0)),
             log_file=dotenv_config.get("LOG_FILE", "logs/podcast_bot.log").strip(),
             recent_days=int(dotenv_config.get("RECENT_DAYS", 5)),
             max_episodes=int(dotenv_config.get("MAX_EPISODES", 50)),
@@ -175,6 +318,9 @@ class AppEnvironment:
             user_agent=dotenv_config.get("USER_AGENT", _DEFAULT_USER_AGENT).strip(),
             template_directory=dotenv_config.get("POST_TEMPLATE_DIR", "templates").strip(),
             template_file=dotenv_config.get("POST_TEMPLATE", "post.txt.jinja").strip(),
+            bounded_parse=dotenv_config.get("BOUNDED_PARSE", "false").strip().lower() == "true",
+            min_poll_interval=int(dotenv_config.get("MIN_POLL_INTERVAL", 300)),
+            max_poll_interval=int(dotenv_config.get("MAX_POLL_INTERVAL", 21600)),
         )
 
         return [feed_settings]
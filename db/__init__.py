@@ -3,12 +3,56 @@
 # SPDX-License-Identifier: MIT
 #
 # vim: set noai syntax=python ts=4 sw=4:
+# pylint: disable=C0415
 """Feed Database Module."""
-import sqlite3
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from itertools import islice
 from pathlib import Path
-from sqlite3 import Connection, Cursor
-from typing import Any
+from threading import Lock
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+if TYPE_CHECKING:
+    from sqlite3 import Connection, Cursor
+
+# Maximum number of values bound in a single IN (...) clause, which keeps
+# queries under the SQLite host parameter limit
+_MAX_QUERY_VALUES: int = 500
+
+# Database schema version, stored in the database using PRAGMA user_version.
+# Version 1 (user_version 0) stores processed timestamps as strings and
+# version 2 stores them as integer Unix timestamps. Version 3 adds a unique
+# index on podcast name, GUID and enclosure URL. Version 4 stores a hash of
+# the content of each feed.
+SCHEMA_VERSION: int = 4
+
+# Unique episode key. Missing podcast names and enclosure URLs are indexed
+# as empty strings so that they are treated as equal
+_EPISODE_KEY: str = "IFNULL(podcast_name, ''), guid, IFNULL(enclosure_url, '')"
+
+
+class MergeResult(NamedTuple):
+    """Episode Entries Merge Result."""
+
+    inserted: int = 0
+    skipped: int = 0
+
+
+def processed_timestamp(value: datetime | str | float) -> int:
+    """Returns an episode processed date and time as a Unix timestamp.
+
+    Accepts a datetime, a Unix timestamp or a date and time string as
+    stored by schema version 1, which is treated as local time.
+    """
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+
+    if isinstance(value, str):
+        return int(datetime.fromisoformat(value.strip()).timestamp())
+
+    return int(value)
 
 
 class FeedDatabase:
@@ -16,50 +60,182 @@ class FeedDatabase:
 
     _timestamp = datetime.now()
 
-    def __init__(self, db_file: str = None) -> None:
-        """Class initialization method."""
-        if db_file and not Path(db_file).exists():
-            self.initialize(db_file)
-            self.connection: Connection = sqlite3.connect(db_file)
-        if db_file and Path(db_file).exists():
-            self.connection: Connection = sqlite3.connect(db_file)
-            self._migrate()
+    def __init__(
+        self,
+        db_file: str = None,
+        wal_mode: bool = False,
+        busy_timeout: float = 5.0,
+    ) -> None:
+        """Class initialization method.
+
+        If ``wal_mode`` is set, the database is switched to write-ahead
+        logging with ``synchronous=NORMAL`` so that readers do not block
+        writes. ``busy_timeout`` sets the number of seconds to wait for a
+        locked database before raising an error.
+        """
+        self._unit_of_work_depth: int = 0
+        self._pending_inserts: list[tuple[str, str | None, str | None, int]] = []
+        self._pending_statements: list[tuple[str, tuple[Any, ...]]] = []
+        # Total time, in seconds, spent writing queued changes
+        self.commit_time: float = 0.0
+
+        if db_file:
+            import sqlite3
+
+            db_file_exists: bool = Path(db_file).exists()
+            if not db_file_exists:
+                self.initialize(db_file)
+
+            self.connection: Connection = sqlite3.connect(db_file, timeout=busy_timeout)
+            if db_file_exists:
+                self._migrate()
+
+        if db_file and wal_mode:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+
+    def close(self) -> None:
+        """Write any queued changes and close the database connection."""
+        self._flush()
+        self.connection.close()
 
     def initialize(self, db_file: str) -> None:
         """Initialize feed database with the required table."""
         if Path(db_file).exists():
             return
 
+        import sqlite3
+
         database: Connection = sqlite3.connect(db_file)
-        database.execute(
-            "CREATE TABLE episodes(podcast_name str, guid str, enclosure_url str, processed str)"
-        )
+        self._create_tables(database)
+        self._create_unique_index(database)
+        self._add_content_hash(database)
+        database.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
         database.commit()
         database.close()
 
-    def _migrate(self) -> None:
-        """Run any required database migration steps."""
-        cursor = self.connection.execute(
-            "SELECT name FROM pragma_table_info('episodes') WHERE name = 'enclosure_url'"
+    def _create_tables(self, database: "Connection") -> None:
+        """Create the schema version 2 tables and indexes."""
+        database.execute(
+            "CREATE TABLE episodes(podcast_name TEXT, guid TEXT, enclosure_url TEXT, "
+            "processed INTEGER)"
+        )
+        database.execute(
+            "CREATE TABLE feed_validators(podcast_name TEXT PRIMARY KEY, feed_url TEXT, "
+            "etag TEXT, last_modified TEXT)"
         )
-        result = cursor.fetchone()
+        database.execute("CREATE INDEX idx_episodes_podcast_guid ON episodes(podcast_name, guid)")
+        database.execute(
+            "CREATE INDEX idx_episodes_podcast_enclosure_url "
+            "ON episodes(podcast_name, enclosure_url)"
+        )
+        database.execute("CREATE INDEX idx_episodes_processed ON episodes(processed)")
+
+    def _create_unique_index(self, database: "Connection") -> None:
+        """Create the unique episode index added in schema version 3."""
+        database.execute(f"CREATE UNIQUE INDEX idx_episodes_unique ON episodes({_EPISODE_KEY})")
+
+    def _add_content_hash(self, database: "Connection") -> None:
+        """Add the feed content hash column added in schema version 4."""
+        database.execute("ALTER TABLE feed_validators ADD COLUMN content_hash TEXT")
+
+    def _migrate(self) -> None:
+        """Run any required database migration steps.
+
+        All steps are run in a single transaction, so a database is either
+        fully migrated or left unchanged.
+        """
+        import sqlite3
+
+        cursor: Cursor = self.connection.execute("PRAGMA user_version")
+        version: int = cursor.fetchone()[0]
         cursor.close()
-        if not result:
-            self.connection.execute("ALTER TABLE episodes ADD COLUMN enclosure_url str")
+        if version >= SCHEMA_VERSION:
+            return
+
+        try:
+            self.connection.execute("BEGIN")
+            if version < 2:
+                self._migrate_v2()
+            if version < 3:
+                self._migrate_v3()
+            if version < 4:
+                self._add_content_hash(self.connection)
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
             self.connection.commit()
+        except sqlite3.Error:
+            self.connection.rollback()
+            raise
 
-        cursor = self.connection.execute(
-            "SELECT name FROM pragma_table_info('episodes') WHERE name = 'podcast_name'"
+    def _migrate_v2(self) -> None:
+        """Migrate a schema version 1 database to schema version 2.
+
+        Version 1 databases, including those created by older versions of
+        the import script, may be missing the podcast_name and
+        enclosure_url columns and the feed_validators table. Processed
+        date and time strings are converted from local time to Unix
+        timestamps. Values that cannot be converted are set to the time of
+        the migration so that they are removed by a later clean-up.
+        """
+        cursor: Cursor = self.connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' "
+            "AND name IN ('episodes', 'feed_validators')"
         )
-        result = cursor.fetchone()
+        tables: set[str] = {row[0] for row in cursor}
         cursor.close()
-        if not result:
-            self.connection.execute("ALTER TABLE episodes ADD COLUMN podcast_name str")
-            self.connection.commit()
+        cursor = self.connection.execute("SELECT name FROM pragma_table_info('episodes')")
+        columns: set[str] = {row[0] for row in cursor}
+        cursor.close()
+
+        for table in tables:
+            self.connection.execute(f"ALTER TABLE {table} RENAME TO {table}_v1")
+        for index in (
+            "idx_episodes_podcast_guid",
+            "idx_episodes_podcast_enclosure_url",
+            "idx_episodes_processed",
+        ):
+            self.connection.execute(f"DROP INDEX IF EXISTS {index}")
+
+        self._create_tables(self.connection)
+        if "episodes" in tables:
+            podcast_name: str = "podcast_name" if "podcast_name" in columns else "NULL"
+            enclosure_url: str = "enclosure_url" if "enclosure_url" in columns else "NULL"
+            self.connection.execute(
+                "INSERT INTO episodes (podcast_name, guid, enclosure_url, processed) "
+                f"SELECT {podcast_name}, guid, {enclosure_url}, CASE "
+                "WHEN typeof(processed) IN ('integer', 'real') THEN CAST(processed AS INTEGER) "
+                "ELSE COALESCE(CAST(strftime('%s', processed, 'utc') AS INTEGER), "
+                "CAST(strftime('%s', 'now') AS INTEGER)) END "
+                "FROM episodes_v1 ORDER BY rowid"
+            )
+            self.connection.execute("DROP TABLE episodes_v1")
+
+        if "feed_validators" in tables:
+            self.connection.execute(
+                "INSERT INTO feed_validators SELECT podcast_name, feed_url, etag, last_modified "
+                "FROM feed_validators_v1"
+            )
+            self.connection.execute("DROP TABLE feed_validators_v1")
+
+    def _migrate_v3(self) -> None:
+        """Migrate a schema version 2 database to schema version 3.
+
+        Duplicate entries for the same podcast name, GUID and enclosure
+        URL are removed, keeping the entry with the earliest processed
+        timestamp, before the unique episode index is created.
+        """
+        self.connection.execute(
+            "DELETE FROM episodes WHERE rowid IN (SELECT rowid FROM (SELECT rowid, "
+            f"ROW_NUMBER() OVER (PARTITION BY {_EPISODE_KEY} ORDER BY processed, rowid) "
+            "AS entry FROM episodes) WHERE entry > 1)"
+        )
+        self._create_unique_index(self.connection)
 
     def connect(self, db_file: str) -> None:
         """Returns a connection to the feed database."""
         if Path(db_file).exists():
+            import sqlite3
+
             self.connection = sqlite3.connect(db_file)
 
     def insert(
@@ -73,21 +249,62 @@ class FeedDatabase:
 
         Default: current date/time.
         """
-        if enclosure_url:
+        self._pending_inserts.append(
+            (guid, enclosure_url or None, feed_name, processed_timestamp(timestamp))
+        )
+        self._flush()
+
+    def merge(
+        self, rows: Iterable[tuple[str | None, str, str | None, int]], chunk_size: int = 10000
+    ) -> MergeResult:
+        """Merge episode entries into the feed database.
+
+        Each row contains a podcast name, GUID, enclosure URL and processed
+        Unix timestamp. Rows are loaded into a temporary staging table in
+        chunks of ``chunk_size`` rows and then merged in a single statement.
+        Entries that already exist, or that are repeated in the rows, are
+        skipped and keep the earliest processed timestamp. All changes are
+        written in a single transaction.
+        """
+        import sqlite3
+
+        self._flush()
+        staged: int = 0
+        rows = iter(rows)
+        try:
             self.connection.execute(
-                (
-                    "INSERT INTO episodes (guid, enclosure_url, podcast_name, "
-                    "processed) VALUES (?, ?, ?, ?)"
-                ),
-                (guid, enclosure_url, feed_name, timestamp),
+                "CREATE TEMP TABLE IF NOT EXISTS episodes_staging(podcast_name TEXT, guid TEXT, "
+                "enclosure_url TEXT, processed INTEGER)"
             )
-            self.connection.commit()
-        else:
+            while chunk := list(islice(rows, max(1, chunk_size))):
+                self.connection.executemany(
+                    "INSERT INTO episodes_staging VALUES (?, ?, ?, ?)", chunk
+                )
+                staged += len(chunk)
+
+            cursor: Cursor = self.connection.execute("SELECT COUNT(*) FROM episodes")
+            existing: int = cursor.fetchone()[0]
+            cursor.close()
+            # The WHERE clause is required by SQLite to parse an upsert
+            # using INSERT ... SELECT
             self.connection.execute(
-                ("INSERT INTO episodes (guid, podcast_name, processed) VALUES (?, ?, ?)"),
-                (guid, feed_name, timestamp),
+                "INSERT INTO episodes (podcast_name, guid, enclosure_url, processed) "
+                "SELECT podcast_name, guid, enclosure_url, MIN(processed) FROM episodes_staging "
+                "WHERE true GROUP BY podcast_name, guid, enclosure_url "
+                f"ON CONFLICT ({_EPISODE_KEY}) DO UPDATE SET processed = excluded.processed "
+                "WHERE excluded.processed < episodes.processed"
             )
+            cursor = self.connection.execute("SELECT COUNT(*) FROM episodes")
+            inserted: int = cursor.fetchone()[0] - existing
+            cursor.close()
             self.connection.commit()
+        except sqlite3.Error:
+            self.connection.rollback()
+            raise
+        finally:
+            self.connection.execute("DROP TABLE IF EXISTS temp.episodes_staging")
+
+        return MergeResult(inserted=inserted, skipped=staged - inserted)
 
     def retrieve(self, episode_guid: str, feed_name: str = None) -> dict[str, Any]:
         """Retrieve stored information for a specific episode GUID."""
@@ -97,14 +314,15 @@ class FeedDatabase:
                 "SELECT guid, processed FROM episodes WHERE guid = ? AND podcast_name = ? LIMIT 1",
                 (episode_guid, feed_name),
             )
-            episode["guid"], episode["processed"] = result.fetchone()
+            episode["guid"], processed = result.fetchone()
         else:
             result: Cursor = self.connection.execute(
                 "SELECT guid, processed FROM episodes WHERE guid = ? LIMIT 1",
                 (episode_guid,),
             )
-            episode["guid"], episode["processed"] = result.fetchone()
+            episode["guid"], processed = result.fetchone()
 
+        episode["processed"] = datetime.fromtimestamp(processed)
         return episode
 
     def retrieve_enclosure_urls(self, feed_name: str = None) -> list[str]:
@@ -142,8 +360,273 @@ class FeedDatabase:
 
         return guids
 
+    def _retrieve_existing(self, column: str, values: set[str], feed_name: str = None) -> set[str]:
+        """Retrieve the subset of values already stored in an episodes column."""
+        existing: set[str] = set()
+        candidates: list[str] = list(values)
+        for start in range(0, len(candidates), _MAX_QUERY_VALUES):
+            batch: list[str] = candidates[start : start + _MAX_QUERY_VALUES]
+            placeholders: str = ", ".join("?" * len(batch))
+            if feed_name:
+                result: Cursor = self.connection.execute(
+                    f"SELECT DISTINCT {column} FROM episodes WHERE podcast_name = ? "
+                    f"AND {column} IN ({placeholders})",
+                    (feed_name, *batch),
+                )
+            else:
+                result: Cursor = self.connection.execute(
+                    f"SELECT DISTINCT {column} FROM episodes WHERE {column} IN ({placeholders})",
+                    batch,
+                )
+            existing.update(row[0] for row in result)
+            result.close()
+
+        return existing
+
+    def retrieve_unseen(
+        self,
+        guids: list[str],
+        enclosure_urls: list[str],
+        feed_name: str = None,
+    ) -> tuple[set[str], set[str]]:
+        """Retrieve the episode GUIDs and enclosure URLs not in the feed database.
+
+        Only the provided GUIDs and enclosure URLs are looked up, rather
+        than every entry stored for a feed.
+        """
+        guid_candidates: set[str] = set(guids)
+        url_candidates: set[str] = set(enclosure_urls)
+        unseen_guids: set[str] = guid_candidates - self._retrieve_existing(
+            "guid", guid_candidates, feed_name=feed_name
+        )
+        unseen_enclosure_urls: set[str] = url_candidates - self._retrieve_existing(
+            "enclosure_url", url_candidates, feed_name=feed_name
+        )
+        return unseen_guids, unseen_enclosure_urls
+
+    def retrieve_validators(
+        self, feed_name: str, feed_url: str
+    ) -> tuple[str | None, str | None, str | None]:
+        """Retrieve the stored HTTP ETag and Last-Modified validators for a feed.
+
+        Also returns the hash of the feed content from the last fetch.
+        Validators stored for a different feed URL are ignored.
+        """
+        result: Cursor = self.connection.execute(
+            "SELECT etag, last_modified, content_hash FROM feed_validators "
+            "WHERE podcast_name = ? AND feed_url = ? LIMIT 1",
+            (feed_name, feed_url),
+        )
+        validators = result.fetchone()
+        result.close()
+        if not validators:
+            return None, None, None
+
+        return validators[0], validators[1], validators[2]
+
+    def store_validators(
+        self,
+        feed_name: str,
+        feed_url: str,
+        etag: str = None,
+        last_modified: str = None,
+        content_hash: str = None,
+    ) -> None:
+        """Store the HTTP ETag and Last-Modified validators and content hash for a feed."""
+        if not etag and not last_modified and not content_hash:
+            self._pending_statements.append(
+                ("DELETE FROM feed_validators WHERE podcast_name = ?", (feed_name,))
+            )
+        else:
+            self._pending_statements.append(
+                (
+                    "INSERT OR REPLACE INTO feed_validators (podcast_name, feed_url, etag, "
+                    "last_modified, content_hash) VALUES (?, ?, ?, ?, ?)",
+                    (feed_name, feed_url, etag, last_modified, content_hash),
+                )
+            )
+        self._flush()
+
     def clean(self, days_to_keep: int = 90) -> None:
         """Remove old episode entries from the database."""
         datetime_filter: datetime = datetime.now() - timedelta(days=days_to_keep)
-        self.connection.execute("DELETE FROM episodes WHERE processed <= ?", (datetime_filter,))
-        self.connection.commit()
+        self._pending_statements.append(
+            ("DELETE FROM episodes WHERE processed <= ?", (processed_timestamp(datetime_filter),))
+        )
+        self._flush()
+
+    @contextmanager
+    def unit_of_work(self) -> Iterator["FeedDatabase"]:
+        """Queue inserts, clean-up and feed validator changes and commit them once.
+
+        All changes made within the context are written in a single
+        transaction when the outermost context exits. Queued changes are
+        discarded if an exception is raised.
+        """
+        self._unit_of_work_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._unit_of_work_depth -= 1
+            if not self._unit_of_work_depth:
+                self._pending_inserts.clear()
+                self._pending_statements.clear()
+            raise
+
+        self._unit_of_work_depth -= 1
+        self._flush()
+
+    def _flush(self) -> None:
+        """Write queued changes in a single transaction, unless in a unit of work."""
+        if self._unit_of_work_depth or not (self._pending_inserts or self._pending_statements):
+            return
+
+        import sqlite3
+
+        start: float = time.perf_counter()
+        try:
+            if self._pending_inserts:
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO episodes (guid, enclosure_url, podcast_name, processed) "
+                    "VALUES (?, ?, ?, ?)",
+                    self._pending_inserts,
+                )
+            for statement, parameters in self._pending_statements:
+                self.connection.execute(statement, parameters)
+            self.connection.commit()
+        except sqlite3.Error:
+            self.connection.rollback()
+            raise
+        finally:
+            self._pending_inserts.clear()
+            self._pending_statements.clear()
+            self.commit_time += time.perf_counter() - start
+
+
+class FeedDatabaseRegistry:
+    """Shared Feed Database Connections.
+
+    Opens and migrates each feed database file once, keyed by the
+    resolved path of the file, and shares the connection between every
+    feed that uses the same database file.
+    """
+
+    def __init__(self) -> None:
+        """Class initialization method."""
+        self._databases: dict[Path, FeedDatabase] = {}
+
+    def get(self, db_file: str, wal_mode: bool = False, busy_timeout: float = 5.0) -> FeedDatabase:
+        """Returns the shared feed database for a database file.
+
+        The WAL mode and busy timeout settings are only applied when the
+        database file is first opened.
+        """
+        db_path: Path = Path(db_file).resolve()
+        if db_path not in self._databases:
+            self._databases[db_path] = FeedDatabase(
+                str(db_path), wal_mode=wal_mode, busy_timeout=busy_timeout
+            )
+
+        return self._databases[db_path]
+
+    def close(self) -> None:
+        """Close all shared feed database connections."""
+        databases: list[FeedDatabase] = list(self._databases.values())
+        self._databases.clear()
+        for database in databases:
+            database.close()
+
+    def __enter__(self) -> "FeedDatabaseRegistry":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __str__(self) -> str:
+        return self.__class__.__name__
+
+
+class FeedLeases:
+    """Feed Ownership Leases.
+
+    Stores leases on feeds in a database file shared by every worker, so
+    that a feed is only processed by the worker holding its lease. A lease
+    expires ``ttl`` seconds after it was last claimed, after which the feed
+    can be claimed by another worker. Lease expiry times use the system
+    clock, which needs to be kept in sync between nodes.
+
+    Workers renew their leases every ``heartbeat`` seconds, a third of
+    ``ttl``, for as long as they run. The database connection is shared
+    between threads, so that leases can be renewed by a background thread
+    while feeds are being processed.
+    """
+
+    def __init__(
+        self, db_file: str, owner: str, ttl: float = 600.0, busy_timeout: float = 30.0
+    ) -> None:
+        """Class initialization method."""
+        import sqlite3
+
+        self.owner: str = owner
+        self.ttl: float = ttl
+        self.heartbeat: float = ttl / 3
+        self._lock: Lock = Lock()
+        # Transactions are started explicitly so that claims take the
+        # database write lock before reading existing leases
+        self.connection: Connection = sqlite3.connect(
+            db_file, timeout=busy_timeout, isolation_level=None, check_same_thread=False
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS feed_leases ("
+            "feed_name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+
+    def claim(self, feed_names: list[str]) -> set[str]:
+        """Claim or renew leases on feeds, returning the names of the feeds claimed.
+
+        Feeds leased by another worker are not claimed until the lease
+        has expired.
+        """
+        claimed: set[str] = set()
+        with self._lock:
+            now: float = time.time()
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                for feed_name in feed_names:
+                    result: Cursor = self.connection.execute(
+                        "INSERT INTO feed_leases (feed_name, owner, expires) VALUES (?, ?, ?) "
+                        "ON CONFLICT (feed_name) DO UPDATE SET owner = excluded.owner, "
+                        "expires = excluded.expires "
+                        "WHERE feed_leases.owner = excluded.owner OR feed_leases.expires <= ?",
+                        (feed_name, self.owner, now + self.ttl, now),
+                    )
+                    if result.rowcount:
+                        claimed.add(feed_name)
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+
+        return claimed
+
+    def renew(self) -> int:
+        """Renew all leases held by the worker, returning the number of leases renewed."""
+        with self._lock:
+            result: Cursor = self.connection.execute(
+                "UPDATE feed_leases SET expires = ? WHERE owner = ?",
+                (time.time() + self.ttl, self.owner),
+            )
+            return result.rowcount
+
+    def release(self) -> None:
+        """Release all leases held by the worker."""
+        with self._lock:
+            self.connection.execute("DELETE FROM feed_leases WHERE owner = ?", (self.owner,))
+
+    def close(self) -> None:
+        """Release all leases held by the worker and close the database connection."""
+        self.release()
+        self.connection.close()
+
+    def __str__(self) -> str:
+        return self.__class__.__name__
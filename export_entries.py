@@ -4,13 +4,18 @@
 #
 # vim: set noai syntax=python ts=4 sw=4:
 """Export Podcast Feed Database Entries to a JSON File Script."""
+import gzip
 import json
 import sqlite3
 import sys
 from argparse import ArgumentParser, Namespace
+from collections.abc import Iterable, Iterator
+from datetime import datetime
 from pathlib import Path
 from sqlite3 import Connection
-from typing import Any
+from typing import Any, TextIO
+
+from db import FeedDatabase, processed_timestamp
 
 
 def command_parse() -> Namespace:
@@ -42,66 +47,183 @@ def command_parse() -> Namespace:
         type=str,
         required=True,
     )
+    parser.add_argument(
+        "--json-lines",
+        "--jsonl",
+        dest="json_lines",
+        help="Stream entries to a JSON Lines file, with one entry per line",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--gzip",
+        dest="gzip",
+        help="Compress the destination file using gzip",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--filter-podcast-name",
+        dest="filter_podcast_name",
+        help="Only export entries stored with this podcast name",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--since",
+        dest="since",
+        help="Only export entries processed on or after this ISO 8601 date and time",
+        type=datetime.fromisoformat,
+        default=None,
+    )
+    parser.add_argument(
+        "--until",
+        dest="until",
+        help="Only export entries processed before this ISO 8601 date and time",
+        type=datetime.fromisoformat,
+        default=None,
+    )
 
     return parser.parse_args()
 
 
-def get_entries(db_file: str, podcast_name: str = None) -> list[dict[str, Any]] | None:
-    """Retrieve entries from a podcast feed database file."""
+def iter_entries(
+    db_file: str,
+    podcast_name: str = None,
+    filter_podcast_name: str = None,
+    since: datetime = None,
+    until: datetime = None,
+) -> Iterator[dict[str, Any]]:
+    """Iterate over entries from a podcast feed database file.
+
+    Entries are read from the database cursor one at a time. Filtering by
+    podcast name and processed date and time is done by the database.
+    """
     db_file_path = Path(db_file)
     if not db_file_path.exists():
         print(f"ERROR: Podcast feed database file {db_file} not found.")
         sys.exit(1)
 
-    database: Connection = sqlite3.connect(db_file)
+    conditions: list[str] = []
+    parameters: list[Any] = []
+    if filter_podcast_name:
+        conditions.append("podcast_name = ?")
+        parameters.append(filter_podcast_name)
+    if since:
+        conditions.append("processed >= ?")
+        parameters.append(processed_timestamp(since))
+    if until:
+        conditions.append("processed < ?")
+        parameters.append(processed_timestamp(until))
+
+    where: str = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+
+    # Opening the database migrates it to the current schema version
+    feed_database: FeedDatabase = FeedDatabase(db_file)
+    database: Connection = feed_database.connection
     database.row_factory = sqlite3.Row
     cursor = database.execute(
-        """SELECT guid, enclosure_url, processed FROM episodes ORDER BY processed ASC"""
+        "SELECT podcast_name, guid, enclosure_url, processed FROM episodes "
+        f"{where}ORDER BY processed ASC",
+        parameters,
     )
-    records = cursor.fetchall()
-    cursor.close()
-
-    if not records:
-        return
-
-    entries = []
-    for record in records:
-        entries.append(
-            {
+    try:
+        for record in cursor:
+            yield {
                 "podcast_name": podcast_name if podcast_name else record["podcast_name"],
                 "guid": record["guid"],
                 "enclosure_url": record["enclosure_url"],
-                "processed_date": record["processed"],
+                "processed_date": str(datetime.fromtimestamp(record["processed"])),
             }
+    finally:
+        cursor.close()
+        database.close()
+
+
+def get_entries(
+    db_file: str,
+    podcast_name: str = None,
+    filter_podcast_name: str = None,
+    since: datetime = None,
+    until: datetime = None,
+) -> list[dict[str, Any]] | None:
+    """Retrieve entries from a podcast feed database file."""
+    entries = list(
+        iter_entries(
+            db_file=db_file,
+            podcast_name=podcast_name,
+            filter_podcast_name=filter_podcast_name,
+            since=since,
+            until=until,
         )
+    )
+    if not entries:
+        return
 
     return entries
 
 
-def export_json(entries: list[dict[str, Any]], json_file: str) -> None:
+def open_output(json_file: str, compress: bool = False) -> TextIO:
+    """Open a destination file for writing, compressed using gzip if requested."""
+    if compress:
+        return gzip.open(json_file, mode="wt", encoding="utf-8")
+
+    return Path(json_file).open(mode="wt", encoding="utf-8")  # noqa: SIM115
+
+
+def export_json(entries: list[dict[str, Any]], json_file: str, compress: bool = False) -> None:
     """Export entries to a JSON file."""
     if not entries:
         return
 
-    json_file_path = Path(json_file)
-    with json_file_path.open(mode="wt", encoding="utf-8") as output_file:
+    with open_output(json_file, compress=compress) as output_file:
         json.dump(entries, output_file, sort_keys=False, indent=2)
 
     return
 
 
+def export_json_lines(
+    entries: Iterable[dict[str, Any]], json_file: str, compress: bool = False
+) -> int:
+    """Export entries to a JSON Lines file, returning the number of entries written."""
+    count: int = 0
+    with open_output(json_file, compress=compress) as output_file:
+        for entry in entries:
+            output_file.write(json.dumps(entry, sort_keys=False))
+            output_file.write("\n")
+            count += 1
+
+    return count
+
+
 def _main() -> None:
     """Script entry point."""
     _command = command_parse()
+    if _command.json_lines:
+        count: int = export_json_lines(
+            entries=iter_entries(
+                db_file=_command.db_file,
+                podcast_name=_command.podcast_name,
+                filter_podcast_name=_command.filter_podcast_name,
+                since=_command.since,
+                until=_command.until,
+            ),
+            json_file=_command.json_file,
+            compress=_command.gzip,
+        )
+        print(f"Exported {count} entries.")
+        return
+
     _entries = get_entries(
         db_file=_command.db_file,
         podcast_name=_command.podcast_name,
+        filter_podcast_name=_command.filter_podcast_name,
+        since=_command.since,
+        until=_command.until,
     )
     if not _entries:
         print("No entries to export.")
         return
 
-    export_json(entries=_entries, json_file=_command.json_file)
+    export_json(entries=_entries, json_file=_command.json_file, compress=_command.gzip)
     return
 
 
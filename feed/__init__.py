@@ -3,31 +3,970 @@
 # SPDX-License-Identifier: MIT
 #
 # vim: set noai syntax=python ts=4 sw=4:
-# pylint: disable=R1732
+# pylint: disable=R1732,C0415
 """Podcast Feed Module."""
-from typing import Any
-from urllib import request
+import hashlib
+import json
+import tempfile
+import time
+import zlib
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from functools import cache
+from pathlib import Path
+from threading import BoundedSemaphore, Lock
+from typing import TYPE_CHECKING, Any, NamedTuple
+from urllib.parse import urljoin, urlsplit
 
-import podcastparser
+from config import FeedSettings
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+    from http.client import HTTPConnection, HTTPResponse
+    from ssl import SSLContext
+
+# Size of the chunks read from a feed response and the size of a feed body
+# kept in memory before it is spooled to a temporary file
+_READ_SIZE: int = 64 * 1024
+_SPOOL_SIZE: int = 4 * 1024 * 1024
+
+_REDIRECT_STATUSES: tuple[int, ...] = (301, 302, 303, 307, 308)
+
+# Number of consecutive episodes older than the cutoff read before bounded
+# parsing stops, so that a recent episode listed after an older one is
+# still read and the feed is then parsed in full
+_BOUNDED_OLDER_EPISODES: int = 5
+
+
+class Episode(NamedTuple):
+    """Podcast Episode.
+
+    Only the fields used to de-duplicate and post an episode are kept from
+    each parsed feed item. ``published`` is a Unix timestamp, or 0 if the
+    episode has no publish date, and ``duration`` is in seconds.
+    """
+
+    guid: str
+    published: int
+    title: str
+    duration: int
+    url: str
+    description: str
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Returns a field by name, as used by podcastparser to sort parsed episodes."""
+        return getattr(self, key, default)
+
+
+class FetchResult(NamedTuple):
+    """Podcast Feed Fetch Result."""
+
+    episodes: list[Episode] | None = None
+    error: Exception | None = None
+    not_modified: bool = False
+    etag: str | None = None
+    last_modified: str | None = None
+    fetch_time: float = 0.0
+    parse_time: float = 0.0
+    bytes_downloaded: int = 0
+    content_hash: str | None = None
+
+
+class _CountingReader:
+    """File-like wrapper that counts the number of bytes read from a stream.
+
+    If a ``deadline`` is provided, as a ``time.monotonic()`` value, reading
+    raises ``TimeoutError`` once the deadline has passed. Sized reads wait
+    for at most one read from the underlying socket so that a slow server
+    cannot hold a single read open past the deadline.
+    """
+
+    def __init__(self, stream: Any, deadline: float = None) -> None:
+        """Class initialization method."""
+        self.stream: Any = stream
+        self.deadline: float | None = deadline
+        self.bytes_read: int = 0
+        self.eof: bool = False
+
+    def read(self, size: int = -1) -> bytes:
+        """Read from the wrapped stream."""
+        if self.deadline and time.monotonic() > self.deadline:
+            raise TimeoutError("Podcast feed fetch deadline exceeded")
+
+        if size is None or size < 0:
+            data: bytes = self.stream.read()
+        elif hasattr(self.stream, "read1"):
+            data: bytes = self.stream.read1(size)
+        else:
+            data: bytes = self.stream.read(size)
+
+        self.bytes_read += len(data)
+        if not data and size != 0:
+            self.eof = True
+        return data
+
+    def close(self) -> None:
+        """Close the wrapped stream."""
+        self.stream.close()
+
+    def __str__(self) -> str:
+        return self.__class__.__name__
+
+
+class _DecompressingReader:
+    """File-like wrapper that decompresses a gzip or deflate encoded stream.
+
+    Compressed data is read from the wrapped stream in chunks and
+    decompressed incrementally, so the complete response body is never
+    held in memory.
+    """
+
+    _chunk_size: int = _READ_SIZE
+
+    def __init__(self, stream: Any, encoding: str) -> None:
+        """Class initialization method."""
+        self.stream: Any = stream
+        self.encoding: str = encoding
+        self._decompressor = self._new_decompressor()
+        self._started: bool = False
+        self._eof: bool = False
+
+    def _new_decompressor(self, raw: bool = False) -> Any:
+        """Returns a decompressor for the content encoding."""
+        if self.encoding == "gzip":
+            return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        # Some servers send raw deflate data without the zlib header
+        return zlib.decompressobj(-zlib.MAX_WBITS if raw else zlib.MAX_WBITS)
+
+    def _decompress(self, data: bytes, size: int) -> bytes:
+        """Decompress data, falling back to raw deflate for the first chunk."""
+        try:
+            output: bytes = self._decompressor.decompress(data, size)
+        except zlib.error:
+            if self.encoding != "deflate" or self._started:
+                raise
+
+            self._decompressor = self._new_decompressor(raw=True)
+            output = self._decompressor.decompress(data, size)
+
+        self._started = True
+        if self._decompressor.eof and self._decompressor.unused_data:
+            # Concatenated gzip members are decompressed as one stream
+            unused_data: bytes = self._decompressor.unused_data
+            self._decompressor = self._new_decompressor()
+            output += self._decompressor.decompress(unused_data, max(size - len(output), 0))
+
+        return output
+
+    def read(self, size: int = -1) -> bytes:
+        """Read decompressed data, up to ``size`` bytes if ``size`` is positive."""
+        if size == 0:
+            return b""
+
+        if size is None or size < 0:
+            return b"".join(iter(lambda: self.read(self._chunk_size), b""))
+
+        output: bytes = b""
+        while not output and not self._eof:
+            data: bytes = self._decompressor.unconsumed_tail or self.stream.read(self._chunk_size)
+            if not data:
+                output = self._decompressor.flush()
+                self._eof = True
+            else:
+                output = self._decompress(data, size)
+
+        return output
+
+    def close(self) -> None:
+        """Close the wrapped stream."""
+        self.stream.close()
+
+    def __str__(self) -> str:
+        return self.__class__.__name__
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of fetching a podcast feed from a host that is failing."""
+
+
+class CircuitBreaker:
+    """Per-Host Circuit Breaker.
+
+    After ``failure_threshold`` consecutive failed fetches from a host,
+    the circuit for the host opens and fetches from the host are rejected.
+    Once ``reset_timeout`` seconds have passed, a single probe fetch is
+    allowed through. The circuit closes if the probe succeeds, or opens
+    again for another ``reset_timeout`` seconds if it fails.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 300.0) -> None:
+        """Class initialization method."""
+        self.failure_threshold: int = max(1, failure_threshold)
+        self.reset_timeout: float = reset_timeout
+        self._failures: dict[str, int] = {}
+        self._opened: dict[str, float] = {}
+        self._probing: set[str] = set()
+        self._lock: Lock = Lock()
+
+    def allow(self, host: str) -> bool:
+        """Returns whether a fetch from a host is allowed."""
+        with self._lock:
+            opened: float | None = self._opened.get(host)
+            if opened is None:
+                return True
+
+            if host in self._probing or time.monotonic() - opened < self.reset_timeout:
+                return False
+
+            self._probing.add(host)
+            return True
+
+    def record_success(self, host: str) -> None:
+        """Close the circuit for a host after a successful fetch."""
+        with self._lock:
+            self._failures.pop(host, None)
+            self._opened.pop(host, None)
+            self._probing.discard(host)
+
+    def record_failure(self, host: str) -> None:
+        """Record a failed fetch, opening the circuit for a host if needed."""
+        with self._lock:
+            self._failures[host] = self._failures.get(host, 0) + 1
+            if host in self._probing or self._failures[host] >= self.failure_threshold:
+                self._opened[host] = time.monotonic()
+            self._probing.discard(host)
+
+    def __str__(self) -> str:
+        return self.__class__.__name__
+
+
+def _host_failure(error: Exception) -> bool:
+    """Returns whether an error indicates a failing host, rather than a bad feed.
+
+    Connection errors, timeouts, invalid HTTP responses and server errors
+    count as host failures. Client errors and feed parsing errors do not.
+    """
+    from http.client import HTTPException
+    from urllib.error import HTTPError
+
+    if isinstance(error, HTTPError):
+        return error.code >= 500
+
+    return isinstance(error, OSError | HTTPException)
+
+
+class _PooledConnection(NamedTuple):
+    """Connection checked out of a connection pool."""
+
+    key: tuple[str, str]
+    connection: "HTTPConnection"
+
+
+class ConnectionPool:
+    """Keep-Alive HTTP Connection Pool.
+
+    Keeps idle HTTP and HTTPS connections for reuse, keyed by scheme and
+    host, so that feeds on the same host do not each need a new TCP
+    connection and TLS handshake. Up to ``max_size`` idle connections are
+    kept for each host and connections idle for longer than
+    ``idle_timeout`` seconds are closed instead of being reused.
+
+    Requests for feeds that are not HTTP or HTTPS, or that should be sent
+    through a proxy configured in the environment, are not handled by the
+    pool.
+    """
+
+    def __init__(self, max_size: int = 2, idle_timeout: float = 60.0) -> None:
+        """Class initialization method."""
+        from urllib.request import getproxies
+
+        self.max_size: int = max(0, max_size)
+        self.idle_timeout: float = idle_timeout
+        self._proxies: dict[str, str] = getproxies()
+        self._idle: dict[tuple[str, str], list[tuple[HTTPConnection, float]]] = {}
+        self._lock: Lock = Lock()
+        self._ssl_context: SSLContext | None = None
+
+    def handles(self, url: str) -> bool:
+        """Returns whether requests for a URL can be made using the pool."""
+        from urllib.request import proxy_bypass
+
+        parts = urlsplit(url)
+        scheme: str = parts.scheme.lower()
+        if scheme not in ("http", "https"):
+            return False
+
+        return scheme not in self._proxies or bool(proxy_bypass(parts.hostname or ""))
+
+    def _connect(self, key: tuple[str, str]) -> "HTTPConnection":
+        """Returns a new connection for a scheme and host."""
+        import http.client
+
+        scheme, host = key
+        if scheme == "https":
+            with self._lock:
+                if not self._ssl_context:
+                    import ssl
+
+                    self._ssl_context = ssl.create_default_context()
+
+            return http.client.HTTPSConnection(host, context=self._ssl_context)
+
+        return http.client.HTTPConnection(host)
+
+    def _acquire(self, key: tuple[str, str]) -> tuple["HTTPConnection", bool]:
+        """Returns an idle connection for a host, or a new connection.
+
+        Also returns whether the connection has been used before.
+        """
+        expired: list[HTTPConnection] = []
+        connection: HTTPConnection | None = None
+        with self._lock:
+            idle: list[tuple[HTTPConnection, float]] = self._idle.get(key, [])
+            now: float = time.monotonic()
+            while idle and not connection:
+                candidate, released = idle.pop()
+                if now - released > self.idle_timeout:
+                    expired.append(candidate)
+                else:
+                    connection = candidate
+
+        for candidate in expired:
+            candidate.close()
+
+        if connection:
+            return connection, True
+
+        return self._connect(key), False
+
+    def release(self, pooled: _PooledConnection, reusable: bool = True) -> None:
+        """Return a connection to the pool once its response has been read.
+
+        Connections that cannot be reused, or that do not fit in the pool,
+        are closed.
+        """
+        with self._lock:
+            idle: list[tuple[HTTPConnection, float]] = self._idle.setdefault(pooled.key, [])
+            if reusable and len(idle) < self.max_size:
+                idle.append((pooled.connection, time.monotonic()))
+                return
+
+        pooled.connection.close()
+
+    def prune(self) -> None:
+        """Close idle connections that have exceeded the idle timeout."""
+        expired: list[HTTPConnection] = []
+        with self._lock:
+            now: float = time.monotonic()
+            for key, idle in self._idle.items():
+                expired.extend(
+                    connection
+                    for connection, released in idle
+                    if now - released > self.idle_timeout
+                )
+                self._idle[key] = [
+                    (connection, released)
+                    for connection, released in idle
+                    if now - released <= self.idle_timeout
+                ]
+
+        for connection in expired:
+            connection.close()
+
+    def _request(
+        self,
+        key: tuple[str, str],
+        path: str,
+        headers: dict[str, str],
+        connect_timeout: float = None,
+        read_timeout: float = None,
+    ) -> tuple["HTTPResponse", _PooledConnection]:
+        """Send a GET request using a pooled connection.
+
+        A reused connection may have been closed by the server while it
+        was idle. If so, the request is retried using another connection.
+        """
+        import http.client
+
+        while True:
+            connection, reused = self._acquire(key)
+            try:
+                if not connection.sock:
+                    connection.timeout = connect_timeout
+                    connection.connect()
+                connection.sock.settimeout(read_timeout)
+                connection.request("GET", path, headers=headers)
+                response: HTTPResponse = connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                connection.close()
+                if reused:
+                    continue
+                raise
+            except Exception:
+                connection.close()
+                raise
+
+            return response, _PooledConnection(key=key, connection=connection)
+
+    def urlopen(
+        self,
+        url: str,
+        headers: dict[str, str],
+        max_redirects: int = 10,
+        connect_timeout: float = None,
+        read_timeout: float = None,
+        deadline: float = None,
+    ) -> tuple["HTTPResponse", _PooledConnection]:
+        """Send a GET request for a URL, following redirects.
+
+        Returns the response, which may be a 304 Not Modified response,
+        and the connection to release once the response has been read.
+        Raises ``urllib.error.HTTPError`` for error responses and
+        ``TimeoutError`` if the ``deadline`` passes while following
+        redirects.
+        """
+        from urllib.error import HTTPError
+
+        for _ in range(max_redirects + 1):
+            if deadline and time.monotonic() > deadline:
+                raise TimeoutError("Podcast feed fetch deadline exceeded")
+
+            parts = urlsplit(url)
+            path: str = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+            response, pooled = self._request(
+                (parts.scheme.lower(), parts.netloc.lower()),
+                path,
+                headers,
+                connect_timeout=connect_timeout,
+                read_timeout=read_timeout,
+            )
+            if response.status == 200 or response.status == 304:
+                return response, pooled
+
+            # Redirect and error response bodies are read so that the
+            # connection can be reused
+            response.read()
+            response.close()
+            self.release(pooled, reusable=not response.will_close)
+            location: str | None = response.getheader("Location")
+            if response.status not in _REDIRECT_STATUSES or not location:
+                raise HTTPError(url, response.status, response.reason, response.headers, None)
+
+            url = urljoin(url, location)
+
+        raise HTTPError(url, response.status, "Too many redirects", response.headers, None)
+
+    def close(self) -> None:
+        """Close all idle connections."""
+        with self._lock:
+            idle_connections: list[list[tuple[HTTPConnection, float]]] = list(self._idle.values())
+            self._idle = {}
+
+        for idle in idle_connections:
+            for connection, _ in idle:
+                connection.close()
+
+    def __str__(self) -> str:
+        return self.__class__.__name__
+
+
+class _StopParsingError(Exception):
+    """Raised by a feed handler to stop parsing a podcast feed early."""
+
+
+@cache
+def _episode_handler_class() -> type:
+    """Returns the podcast feed handler class that projects parsed episodes.
+
+    The class is created on first use so that podcastparser is only
+    imported once a feed is parsed.
+    """
+    import podcastparser
+
+    class EpisodeHandler(podcastparser.PodcastHandler):
+        """Podcast feed handler that keeps episodes as Episode records.
+
+        Each feed item is parsed into a dictionary as usual, then replaced
+        by an Episode once the item ends, so the dictionaries and fields
+        that are not used are not kept. Items without an enclosure, which
+        cannot be posted, are dropped.
+        """
+
+        def validate_episode(self) -> None:
+            count: int = len(self.episodes)
+            super().validate_episode()
+            if len(self.episodes) < count:
+                return
+
+            entry: dict[str, Any] = self.episodes[-1]
+            if not entry["enclosures"]:
+                self.episodes.pop()
+                return
+
+            self.episodes[-1] = Episode(
+                guid=entry["guid"],
+                published=entry["published"],
+                title=entry["title"].strip(),
+                duration=entry["total_time"],
+                url=entry["enclosures"][0]["url"].strip(),
+                description=entry.get("description_html", entry["description"]).strip(),
+            )
+
+    return EpisodeHandler
+
+
+@cache
+def _bounded_handler_class() -> type:
+    """Returns the bounded podcast feed handler class."""
+
+    class BoundedPodcastHandler(_episode_handler_class()):
+        """Podcast feed handler that stops parsing once enough episodes are parsed.
+
+        Parsing stops once ``max_episodes`` episodes have been parsed or
+        several consecutive episodes published before ``published_after``
+        have been parsed, but only while the episodes seen so far are
+        ordered newest first. Once an episode out of order is seen, or if
+        the feed is marked as serial, the rest of the feed is parsed.
+        Episodes listed after the point where parsing stops are not read.
+        """
+
+        def __init__(self, url: str, max_episodes: int, published_after: float = None) -> None:
+            super().__init__(url, max_episodes)
+            self.published_after: float | None = published_after
+            self._newest_first: bool = True
+            self._last_published: int | None = None
+            self._older_episodes: int = 0
+
+        def validate_episode(self) -> None:
+            count: int = len(self.episodes)
+            super().validate_episode()
+            if len(self.episodes) < count or not self._newest_first:
+                return
+
+            published: int = self.episodes[-1].published
+            if (
+                self.data.get("type") == "serial"
+                or not published
+                or (self._last_published is not None and published > self._last_published)
+            ):
+                self._newest_first = False
+                return
+
+            self._last_published = published
+            if self.max_episodes and len(self.episodes) >= self.max_episodes:
+                raise _StopParsingError
+
+            if self.published_after is not None and published < self.published_after:
+                self._older_episodes += 1
+                if self._older_episodes >= _BOUNDED_OLDER_EPISODES:
+                    raise _StopParsingError
+
+    return BoundedPodcastHandler
+
+
+def _parse(
+    url: str, stream: Any, max_episodes: int = 0, published_after: float = None
+) -> dict[str, Any]:
+    """Parse a podcast feed into Episode records.
+
+    If ``published_after`` is provided, only as much of the stream as
+    required is read.
+    """
+    from xml import sax
+
+    import podcastparser
+
+    if published_after is None:
+        handler = _episode_handler_class()(url, max_episodes)
+    else:
+        handler = _bounded_handler_class()(url, max_episodes, published_after)
+
+    try:
+        sax.parse(stream, handler)  # noqa: S317
+    except _StopParsingError:
+        # Apply the same sorting and truncation as a completely parsed feed
+        podcastparser.PodcastItem().end(handler, "")
+    except sax.SAXParseException as error:
+        raise podcastparser.FeedParseError(
+            error.getMessage(), error.getException(), error._locator
+        ) from error
+
+    return handler.data
+
+
+def _episode_cache_file(
+    episode_cache: str, feed_url: str, max_episodes: int, content_hash: str
+) -> Path:
+    """Returns the path of the cached episodes for a feed's content."""
+    # Episode fields are part of the key so that cached episodes are not
+    # used after the fields change
+    key: str = hashlib.sha256(
+        f"{feed_url}\n{max_episodes}\n{content_hash}\n{','.join(Episode._fields)}".encode()
+    ).hexdigest()
+    return Path(episode_cache) / f"{key}.json"
+
+
+def _load_episodes(cache_file: Path) -> list[Episode] | None:
+    """Load cached episodes, if a valid cache file exists."""
+    try:
+        with cache_file.open(mode="r", encoding="utf-8") as episodes_file:
+            return [Episode(*episode) for episode in json.load(episodes_file)]
+    except (OSError, TypeError, ValueError):
+        return None
+
+
+def _store_episodes(cache_file: Path, episodes: list[Episode]) -> None:
+    """Store episodes in a cache file using compact JSON."""
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    temp_file: Path = cache_file.with_name(f".{cache_file.name}.tmp")
+    temp_file.write_text(json.dumps(episodes, separators=(",", ":")), encoding="utf-8")
+    temp_file.replace(cache_file)
 
 
 class PodcastFeed:
     """Podcast Feed Fetcher."""
 
+    def __init__(self) -> None:
+        """Class initialization method."""
+        self.etag: str | None = None
+        self.last_modified: str | None = None
+        self.not_modified: bool = False
+        self.fetch_time: float = 0.0
+        self.parse_time: float = 0.0
+        self.bytes_downloaded: int = 0
+        self.content_hash: str | None = None
+
     def fetch(
         self,
         feed_url: str,
         max_episodes: int = 50,
         user_agent="Mozilla/5.0 (X11; Linux x86_64; rv:130.0) Gecko/20100101 Firefox/130.0",
-    ) -> list[dict[str, Any]]:
-        """Fetch items from the requested podcast feed."""
-        feed_request = request.Request(url=feed_url, headers={"User-Agent": user_agent})
-        feed: dict[str, Any] = podcastparser.parse(
-            url=feed_url,
-            stream=request.urlopen(feed_request),
-            max_episodes=max_episodes,
+        etag: str = None,
+        last_modified: str = None,
+        published_after: datetime = None,
+        content_hash: str = None,
+        episode_cache: str = None,
+        pool: ConnectionPool = None,
+        connect_timeout: float = None,
+        read_timeout: float = None,
+        total_timeout: float = None,
+    ) -> list[Episode]:
+        """Fetch episodes from the requested podcast feed.
+
+        If an ETag or Last-Modified validator from a previous fetch is
+        provided, a conditional request is made. When the server responds
+        that the feed has not been modified, no episodes are returned and
+        ``not_modified`` is set.
+
+        If ``published_after`` is provided, the feed is parsed in bounded
+        mode and reading stops once ``max_episodes`` episodes have been
+        parsed or several consecutive episodes older than
+        ``published_after`` are reached, while the feed is sorted newest
+        first.
+
+        Otherwise, the feed body is hashed as it is downloaded and the hash
+        is stored in ``content_hash``. If the hash matches the provided
+        ``content_hash`` from a previous fetch, the feed is not parsed, no
+        episodes are returned and ``not_modified`` is set. If an
+        ``episode_cache`` directory is provided, parsed episodes are cached
+        using the hash and reused when the same feed content is fetched.
+
+        Feeds may be sent gzip or deflate compressed, and are decompressed
+        as they are read.
+
+        If a connection ``pool`` is provided, the request is made using a
+        pooled keep-alive connection, which is returned to the pool once
+        the response has been read.
+
+        ``connect_timeout`` and ``read_timeout`` limit the time taken to
+        connect to the feed host and to wait for data from the host, and
+        ``total_timeout`` limits the time taken to fetch the whole feed.
+        ``TimeoutError`` is raised if a limit is exceeded. Feeds that are
+        not fetched using the pool use ``read_timeout`` for connecting.
+
+        The time taken to receive the response headers, the time taken to
+        read and parse the response body and the number of bytes read are
+        stored in ``fetch_time``, ``parse_time`` and ``bytes_downloaded``.
+        """
+        from urllib import request
+        from urllib.error import HTTPError
+
+        headers: dict[str, str] = {"User-Agent": user_agent, "Accept-Encoding": "gzip, deflate"}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        start: float = time.perf_counter()
+        deadline: float | None = time.monotonic() + total_timeout if total_timeout else None
+        pooled: _PooledConnection | None = None
+        try:
+            if pool and pool.handles(feed_url):
+                response, pooled = pool.urlopen(
+                    feed_url,
+                    headers=headers,
+                    connect_timeout=connect_timeout,
+                    read_timeout=read_timeout,
+                    deadline=deadline,
+                )
+            else:
+                response = request.urlopen(
+                    request.Request(url=feed_url, headers=headers), timeout=read_timeout
+                )
+        except HTTPError as error:
+            if error.code != 304:
+                raise
+
+            response = error
+        finally:
+            self.fetch_time = time.perf_counter() - start
+
+        # Bytes downloaded are counted before any decompression
+        counter: _CountingReader = _CountingReader(response, deadline=deadline)
+        try:
+            if response.status == 304:
+                counter.read()
+                self.not_modified = True
+                self.etag = etag
+                self.last_modified = last_modified
+                return []
+
+            self.etag = response.headers.get("ETag")
+            self.last_modified = response.headers.get("Last-Modified")
+            stream: _CountingReader | _DecompressingReader = counter
+            encoding: str = response.headers.get("Content-Encoding", "identity").strip().lower()
+            if encoding in ("gzip", "x-gzip", "deflate"):
+                stream = _DecompressingReader(
+                    counter, "deflate" if encoding == "deflate" else "gzip"
+                )
+            start = time.perf_counter()
+            try:
+                if published_after:
+                    feed: dict[str, Any] = _parse(
+                        url=feed_url,
+                        stream=stream,
+                        max_episodes=max_episodes,
+                        published_after=published_after.timestamp(),
+                    )
+                    return feed["episodes"]
+
+                # The body is spooled to memory, or a temporary file for
+                # large feeds, while it is hashed so that unchanged feeds
+                # are not parsed
+                with tempfile.SpooledTemporaryFile(max_size=_SPOOL_SIZE) as body:
+                    digest = hashlib.sha256()
+                    while chunk := stream.read(_READ_SIZE):
+                        digest.update(chunk)
+                        body.write(chunk)
+
+                    self.content_hash = digest.hexdigest()
+                    if content_hash and content_hash == self.content_hash:
+                        self.not_modified = True
+                        return []
+
+                    cache_file: Path | None = None
+                    if episode_cache:
+                        cache_file = _episode_cache_file(
+                            episode_cache, feed_url, max_episodes, self.content_hash
+                        )
+                        episodes: list[Episode] | None = _load_episodes(cache_file)
+                        if episodes is not None:
+                            return episodes
+
+                    body.seek(0)
+                    feed: dict[str, Any] = _parse(
+                        url=feed_url,
+                        stream=body,
+                        max_episodes=max_episodes,
+                    )
+                    if cache_file:
+                        _store_episodes(cache_file, feed["episodes"])
+                    return feed["episodes"]
+            finally:
+                self.parse_time = time.perf_counter() - start
+                self.bytes_downloaded = counter.bytes_read
+        finally:
+            response.close()
+            if pooled:
+                # Connections are only reused once the response is fully read
+                pool.release(pooled, reusable=counter.eof and not response.will_close)
+
+    def __str__(self):
+        return self.__class__.__name__
+
+
+class FeedFetcher:
+    """Concurrent Podcast Feed Fetcher.
+
+    Fetches and parses podcast feeds using a bounded pool of worker
+    threads, with an additional limit on the number of concurrent
+    requests made to any single host.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_per_host: int = 2,
+        episode_cache: str = None,
+        pool_size: int = 2,
+        pool_idle_timeout: float = 60.0,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 30.0,
+        total_timeout: float = 120.0,
+        breaker: CircuitBreaker = None,
+    ) -> None:
+        """Class initialization method.
+
+        If an ``episode_cache`` directory is provided, parsed episodes are
+        cached by feed content and reused when a feed has not changed.
+        Keep-alive connections are shared between feeds and between calls
+        to ``fetch_all`` until the fetcher is closed. Fetches from hosts
+        with an open circuit in the circuit ``breaker`` fail immediately
+        with ``CircuitOpenError``.
+        """
+        self.max_workers: int = max(1, max_workers)
+        self.max_per_host: int = max(1, max_per_host)
+        self.episode_cache: str | None = episode_cache
+        self.pool: ConnectionPool = ConnectionPool(
+            max_size=pool_size, idle_timeout=pool_idle_timeout
+        )
+        self.connect_timeout: float = connect_timeout
+        self.read_timeout: float = read_timeout
+        self.total_timeout: float = total_timeout
+        self.breaker: CircuitBreaker = breaker or CircuitBreaker()
+        self._host_limits: dict[str, BoundedSemaphore] = {}
+        self._host_limits_lock: Lock = Lock()
+
+    def _host_limit(self, host: str) -> BoundedSemaphore:
+        """Returns the semaphore used to limit requests to a feed host."""
+        with self._host_limits_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = BoundedSemaphore(self.max_per_host)
+
+            return self._host_limits[host]
+
+    def _fetch(
+        self,
+        feed: FeedSettings,
+        validators: tuple[str | None, str | None, str | None] = (None, None, None),
+    ) -> FetchResult:
+        """Fetch and parse a single podcast feed."""
+        podcast: PodcastFeed = PodcastFeed()
+        published_after: datetime | None = None
+        if feed.bounded_parse:
+            published_after = datetime.now() - timedelta(days=feed.recent_days)
+
+        host: str = urlsplit(feed.feed_url).netloc.lower()
+        with self._host_limit(host):
+            # Checked once a host slot is free so that queued fetches see
+            # failures from fetches that were running
+            if not self.breaker.allow(host):
+                return FetchResult(
+                    error=CircuitOpenError(f"Circuit open for podcast feed host {host}")
+                )
+
+            try:
+                episodes: list[Episode] = podcast.fetch(
+                    feed_url=feed.feed_url,
+                    max_episodes=feed.max_episodes,
+                    user_agent=feed.user_agent,
+                    etag=validators[0],
+                    last_modified=validators[1],
+                    published_after=published_after,
+                    content_hash=validators[2],
+                    episode_cache=self.episode_cache,
+                    pool=self.pool,
+                    connect_timeout=self.connect_timeout,
+                    read_timeout=self.read_timeout,
+                    total_timeout=self.total_timeout,
+                )
+            except Exception as error:  # pylint: disable=broad-except
+                if _host_failure(error):
+                    self.breaker.record_failure(host)
+                else:
+                    self.breaker.record_success(host)
+
+                return FetchResult(
+                    error=error,
+                    fetch_time=podcast.fetch_time,
+                    parse_time=podcast.parse_time,
+                    bytes_downloaded=podcast.bytes_downloaded,
+                )
+
+            self.breaker.record_success(host)
+
+        return FetchResult(
+            episodes=episodes,
+            not_modified=podcast.not_modified,
+            etag=podcast.etag,
+            last_modified=podcast.last_modified,
+            fetch_time=podcast.fetch_time,
+            parse_time=podcast.parse_time,
+            bytes_downloaded=podcast.bytes_downloaded,
+            content_hash=podcast.content_hash,
         )
-        return feed["episodes"]
+
+    def _schedule(self, feeds: list[FeedSettings]) -> list[int]:
+        """Returns enabled feed indexes interleaved by host.
+
+        Interleaving reduces the chance of every worker thread waiting
+        on the same host limit while feeds on other hosts are queued.
+        """
+        hosts: dict[str, list[int]] = {}
+        for index, feed in enumerate(feeds):
+            if feed.enabled:
+                hosts.setdefault(urlsplit(feed.feed_url).netloc.lower(), []).append(index)
+
+        order: list[int] = []
+        queues: list[list[int]] = list(hosts.values())
+        while queues:
+            order.extend(queue.pop(0) for queue in queues)
+            queues = [queue for queue in queues if queue]
+
+        return order
+
+    def fetch_all(
+        self,
+        feeds: list[FeedSettings],
+        validators: list[tuple[str | None, str | None, str | None]] = None,
+    ) -> Iterator[FetchResult]:
+        """Fetch all enabled podcast feeds concurrently.
+
+        Yields one result per feed in the same order as the feeds were
+        provided, as soon as that feed has been fetched. Disabled feeds
+        are not fetched and yield an empty result. If provided, validators
+        contains the stored ETag, Last-Modified and content hash values for
+        each feed.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        if not validators:
+            validators = [(None, None, None)] * len(feeds)
+
+        self.pool.prune()
+
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="feed-fetch"
+        ) as executor:
+            futures: dict[int, Future] = {
+                index: executor.submit(self._fetch, feeds[index], validators[index])
+                for index in self._schedule(feeds)
+            }
+            try:
+                for index in range(len(feeds)):
+                    if index in futures:
+                        yield futures[index].result()
+                    else:
+                        yield FetchResult()
+            finally:
+                # Stop queued fetches from starting if processing stops early
+                for future in futures.values():
+                    future.cancel()
+
+    def close(self) -> None:
+        """Close idle keep-alive connections."""
+        self.pool.close()
 
     def __str__(self):
         return self.__class__.__name__
@@ -4,13 +4,17 @@
 #
 # vim: set noai syntax=python ts=4 sw=4:
 """Import JSON Entries into a Podcast Feed Database Script."""
+import gzip
 import json
 import sqlite3
 import sys
 from argparse import ArgumentParser, Namespace
+from collections.abc import Iterable, Iterator
+from itertools import islice
 from pathlib import Path
-from sqlite3 import Connection
-from typing import Any
+from typing import Any, TextIO
+
+from db import FeedDatabase, MergeResult, processed_timestamp
 
 
 def command_parse() -> Namespace:
@@ -42,71 +46,181 @@ def command_parse() -> Namespace:
         type=str,
         required=True,
     )
+    parser.add_argument(
+        "--json-lines",
+        "--jsonl",
+        dest="json_lines",
+        help="Stream entries from a JSON Lines file, with one entry per line",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--merge",
+        dest="merge",
+        help="Merge entries, skipping entries that already exist in the database",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        dest="chunk_size",
+        help="Number of entries imported in each transaction (default: 10000)",
+        type=int,
+        default=10000,
+    )
 
     return parser.parse_args()
 
 
-def get_entries(json_file: str) -> list[dict[str, Any]] | None:
-    """Retrieve entries from a podcast feed JSON file."""
+def open_input(json_file: str) -> TextIO:
+    """Open a source file for reading, decompressing it if it is gzip-compressed."""
     json_file_path = Path(json_file)
     if not json_file_path.exists():
         print(f"ERROR: Podcast feed JSON database file {json_file} not found.")
         sys.exit(1)
 
-    with json_file_path.open(mode="r", encoding="utf-8") as input_file:
+    with json_file_path.open(mode="rb") as input_file:
+        compressed: bool = input_file.read(2) == b"\x1f\x8b"
+
+    if compressed:
+        return gzip.open(json_file_path, mode="rt", encoding="utf-8")
+
+    return json_file_path.open(mode="r", encoding="utf-8")
+
+
+def get_entries(json_file: str) -> list[dict[str, Any]] | None:
+    """Retrieve entries from a podcast feed JSON file."""
+    with open_input(json_file) as input_file:
         entries = json.load(input_file)
 
     return entries
 
 
-def create_database(db_file: str) -> None:
-    """Create a podcast feed database file."""
-    database: Connection = sqlite3.connect(db_file)
-    database.execute(
-        "CREATE TABLE episodes(podcast_name str, guid str, enclosure_url str, processed str)"
-    )
-    database.commit()
-    database.close()
-
+def iter_json_lines(json_file: str) -> Iterator[dict[str, Any]]:
+    """Iterate over entries from a podcast feed JSON Lines file, one line at a time."""
+    with open_input(json_file) as input_file:
+        for line in input_file:
+            if line.strip():
+                yield json.loads(line)
 
-def import_entries(entries: list[dict[str, Any]], db_file: str, podcast_name: str) -> None:
-    """Import entries into a podcast feed database file."""
-    if not entries:
-        return
 
-    data = []
+def entry_rows(
+    entries: Iterable[dict[str, Any]], podcast_name: str
+) -> Iterator[tuple[str, str, str | None, int]]:
+    """Iterate over database rows for entries, tagging entries without a podcast name."""
     for entry in entries:
-        if "podcast_name" not in entry or not entry["podcast_name"]:
-            entry["podcast_name"] = podcast_name
-
-        data.append(
-            (
-                entry["podcast_name"],
-                entry["guid"],
-                entry["enclosure_url"],
-                entry["processed_date"],
-            )
+        yield (
+            entry.get("podcast_name") or podcast_name,
+            entry["guid"],
+            entry["enclosure_url"],
+            processed_timestamp(entry["processed_date"]),
         )
 
-    db_file_path = Path(db_file)
-    if not db_file_path.exists():
-        create_database(db_file=db_file)
 
-    database: Connection = sqlite3.connect(db_file)
-    database.executemany("INSERT INTO episodes VALUES(?, ?, ?, ?)", data)
-    database.commit()
-    return
+def import_entries(
+    entries: Iterable[dict[str, Any]],
+    db_file: str,
+    podcast_name: str,
+    chunk_size: int = 10000,
+    progress: bool = False,
+) -> int:
+    """Import entries into a podcast feed database file.
+
+    The database file is created if it does not exist, or migrated to the
+    current schema version if it does. Entries are imported in chunks of
+    ``chunk_size`` entries, each in its own transaction, so that only one
+    chunk is held in memory at a time. Returns the number of entries
+    imported.
+    """
+    if not entries:
+        return 0
+
+    rows: Iterator[tuple[str, str, str | None, int]] = entry_rows(entries, podcast_name)
+    count: int = 0
+    feed_database: FeedDatabase = FeedDatabase(db_file)
+    while chunk := list(islice(rows, max(1, chunk_size))):
+        try:
+            feed_database.connection.executemany(
+                "INSERT INTO episodes (podcast_name, guid, enclosure_url, processed) "
+                "VALUES(?, ?, ?, ?)",
+                chunk,
+            )
+        except sqlite3.IntegrityError:
+            feed_database.connection.rollback()
+            print(
+                f"ERROR: Entries already exist in {db_file}. {count} entries were imported "
+                "before the existing entry. Use --merge to skip existing entries."
+            )
+            sys.exit(1)
+
+        feed_database.connection.commit()
+        count += len(chunk)
+        if progress:
+            print(f"Imported {count} entries.")
+
+    feed_database.close()
+    return count
+
+
+def merge_entries(
+    entries: Iterable[dict[str, Any]],
+    db_file: str,
+    podcast_name: str,
+    chunk_size: int = 10000,
+) -> MergeResult:
+    """Merge entries into a podcast feed database file.
+
+    Entries that already exist in the database, or that are repeated in
+    the entries, are skipped. An existing entry keeps the earliest
+    processed date of the matching entries. All entries are merged in a
+    single transaction.
+    """
+    feed_database: FeedDatabase = FeedDatabase(db_file)
+    result: MergeResult = feed_database.merge(
+        entry_rows(entries, podcast_name), chunk_size=chunk_size
+    )
+    feed_database.close()
+    return result
 
 
 def _main() -> None:
     """Script entry point."""
     _command = command_parse()
+    if _command.merge:
+        result: MergeResult = merge_entries(
+            entries=(
+                iter_json_lines(json_file=_command.json_file)
+                if _command.json_lines
+                else get_entries(json_file=_command.json_file) or []
+            ),
+            db_file=_command.db_file,
+            podcast_name=_command.podcast_name,
+            chunk_size=_command.chunk_size,
+        )
+        print(f"Inserted {result.inserted} entries, skipped {result.skipped} entries.")
+        return
+
+    if _command.json_lines:
+        count: int = import_entries(
+            entries=iter_json_lines(json_file=_command.json_file),
+            db_file=_command.db_file,
+            podcast_name=_command.podcast_name,
+            chunk_size=_command.chunk_size,
+            progress=True,
+        )
+        if not count:
+            print("No entries to import.")
+        return
+
     _entries = get_entries(json_file=_command.json_file)
     if not _entries:
         print("No entries to import.")
         return
 
-    import_entries(entries=_entries, db_file=_command.db_file, podcast_name=_command.podcast_name)
+    import_entries(
+        entries=_entries,
+        db_file=_command.db_file,
+        podcast_name=_command.podcast_name,
+        chunk_size=_command.chunk_size,
+    )
     return
 
 
@@ -0,0 +1,87 @@
+# Copyright (c) 2022-2024 Linh Pham
+# mastodon-podcast-bot is released under the terms of the MIT License
+# SPDX-License-Identifier: MIT
+#
+# vim: set noai syntax=python ts=4 sw=4:
+# pylint: disable=C0415
+"""Podcast Feed Log Handlers Module."""
+import logging
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from logging.handlers import QueueHandler, QueueListener
+
+
+class PrettyFormat:
+    """Pretty-printed log message argument.
+
+    The value is only pretty-printed when the log message is formatted,
+    so debug messages that are not emitted do not format their payload.
+    """
+
+    __slots__ = ("value", "options")
+
+    def __init__(self, value: Any, **options: Any) -> None:
+        """Class initialization method."""
+        self.value: Any = value
+        self.options: dict[str, Any] = options
+
+    def __str__(self) -> str:
+        from pprint import pformat
+
+        return pformat(self.value, **self.options)
+
+
+class LogHandlerRegistry:
+    """Shared Queued Log File Handlers.
+
+    Returns one handler for each log file, shared by every feed that
+    uses the same log file. Records are put on a queue by the returned
+    handler and written to the log file by a listener thread, so that
+    file writes are not made by the thread processing feeds.
+    """
+
+    def __init__(self, fmt: str, datefmt: str = None) -> None:
+        """Class initialization method."""
+        self.formatter: logging.Formatter = logging.Formatter(fmt=fmt, datefmt=datefmt)
+        self._handlers: dict[str, QueueHandler] = {}
+        self._listeners: list[QueueListener] = []
+
+    def get(self, log_file: str) -> "QueueHandler":
+        """Returns the shared handler for a log file.
+
+        The log file is opened and its listener thread is started when the
+        handler is first requested.
+        """
+        from logging.handlers import QueueHandler, QueueListener
+        from queue import SimpleQueue
+
+        if log_file not in self._handlers:
+            file_handler: logging.FileHandler = logging.FileHandler(log_file)
+            file_handler.setFormatter(self.formatter)
+            log_queue: SimpleQueue = SimpleQueue()
+            listener: QueueListener = QueueListener(log_queue, file_handler)
+            listener.start()
+            self._listeners.append(listener)
+            self._handlers[log_file] = QueueHandler(log_queue)
+
+        return self._handlers[log_file]
+
+    def close(self) -> None:
+        """Write any queued records and close all log files."""
+        for listener in self._listeners:
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+
+        self._listeners = []
+        self._handlers = {}
+
+    def __enter__(self) -> "LogHandlerRegistry":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __str__(self) -> str:
+        return self.__class__.__name__
@@ -3,12 +3,23 @@
 # SPDX-License-Identifier: MIT
 #
 # vim: set noai syntax=python ts=4 sw=4:
+# pylint: disable=C0415
 """Mastodon Client Module."""
-from mastodon import Mastodon
+import random
+import time
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from mastodon import Mastodon
 
 
 class MastodonClient:
-    """Simple Mastodon Client for connecting and publishing posts."""
+    """Simple Mastodon Client for connecting and publishing posts.
+
+    The connection to the Mastodon instance is only created when it is
+    first used.
+    """
 
     def __init__(
         self,
@@ -17,29 +28,78 @@ class MastodonClient:
         access_token: str | None = None,
     ) -> None:
         """Class initialization method."""
-        if api_url and access_token:
-            self.connection: Mastodon = self.connect(api_url=api_url, access_token=access_token)
-        elif api_url and client_secret and access_token:
-            self.connection: Mastodon = self.connect(
-                api_url=api_url, client_secret=client_secret, access_token=access_token
-            )
+        self.api_url: str | None = api_url
+        self.client_secret: str | None = client_secret
+        self.access_token: str | None = access_token
+        self._connection: Mastodon | None = None
+
+    @property
+    def account_key(self) -> tuple[str | None, str | None, str | None]:
+        """Returns a key identifying the Mastodon instance and account credentials."""
+        return (
+            self.api_url.rstrip("/") if self.api_url else self.api_url,
+            self.client_secret or None,
+            self.access_token or None,
+        )
+
+    @property
+    def connection(self) -> "Mastodon | None":
+        """Returns the Mastodon connection, connecting on first use."""
+        if not self._connection:
+            if self.api_url and self.client_secret and self.access_token:
+                self._connection = self.connect(
+                    api_url=self.api_url,
+                    client_secret=self.client_secret,
+                    access_token=self.access_token,
+                )
+            elif self.api_url and self.access_token:
+                self._connection = self.connect(
+                    api_url=self.api_url, access_token=self.access_token
+                )
+
+        return self._connection
+
+    @property
+    def rate_limit(self) -> tuple[int, int, float] | None:
+        """Returns the last rate limit, remaining requests and reset time seen.
+
+        Values are parsed by Mastodon.py from the X-RateLimit-* response
+        headers. None is returned if the client has not connected yet.
+        """
+        if not self._connection:
+            return None
+
+        return (
+            self._connection.ratelimit_limit,
+            self._connection.ratelimit_remaining,
+            self._connection.ratelimit_reset,
+        )
 
     def connect(
         self,
         api_url: str,
         client_secret: str | None = None,
         access_token: str | None = None,
-    ) -> Mastodon | None:
-        """Connect to and authenticate against a Mastodon instance."""
+    ) -> "Mastodon | None":
+        """Connect to and authenticate against a Mastodon instance.
+
+        Rate limit errors are raised rather than waited on, so that they
+        can be handled by a post scheduler.
+        """
+        from mastodon import Mastodon
+
         if client_secret and access_token:
             return Mastodon(
                 client_secret=client_secret,
                 access_token=access_token,
                 api_base_url=api_url,
+                ratelimit_method="throw",
             )
 
         if access_token:
-            return Mastodon(access_token=access_token, api_base_url=api_url)
+            return Mastodon(
+                access_token=access_token, api_base_url=api_url, ratelimit_method="throw"
+            )
 
     def post(
         self,
@@ -47,6 +107,7 @@ class MastodonClient:
         sensitive: bool = False,
         visibility: str = "public",
         spoiler_text: str = None,
+        idempotency_key: str = None,
     ) -> None:
         """Post content to a connected Mastodon account."""
         self.connection.status_post(
@@ -54,4 +115,211 @@ class MastodonClient:
             sensitive=sensitive,
             visibility=visibility,
             spoiler_text=spoiler_text,
+            idempotency_key=idempotency_key,
         )
+
+
+class MastodonClientPool:
+    """Shared Mastodon Clients.
+
+    Returns one client per Mastodon API base URL and set of credentials,
+    so that feeds posting to the same account share a single connection
+    and HTTP session.
+    """
+
+    def __init__(self) -> None:
+        """Class initialization method."""
+        self._clients: dict[tuple[str | None, str | None, str | None], MastodonClient] = {}
+
+    def get(
+        self,
+        api_url: str | None,
+        client_secret: str | None = None,
+        access_token: str | None = None,
+    ) -> MastodonClient:
+        """Returns the shared client for a Mastodon API base URL and credentials."""
+        client: MastodonClient = MastodonClient(
+            api_url=api_url, client_secret=client_secret, access_token=access_token
+        )
+        return self._clients.setdefault(client.account_key, client)
+
+    def __str__(self) -> str:
+        return self.__class__.__name__
+
+
+class TokenBucket:
+    """Mastodon Rate Limit Token Bucket.
+
+    Tracks the number of requests remaining in the current rate limit
+    window for a Mastodon instance and account. The bucket is refilled
+    when the window resets and is kept in sync with the X-RateLimit-Limit,
+    X-RateLimit-Remaining and X-RateLimit-Reset values returned by the
+    instance.
+    """
+
+    def __init__(
+        self,
+        limit: int = 300,
+        period: float = 300.0,
+        pace_threshold: float = 0.2,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """Class initialization method."""
+        self.limit: int = limit
+        self.period: float = period
+        self.pace_threshold: float = pace_threshold
+        self.clock: Callable[[], float] = clock
+        self.tokens: float = float(limit)
+        self.reset: float = clock() + period
+
+    def _refill(self) -> None:
+        """Refill the bucket if the current rate limit window has ended."""
+        now: float = self.clock()
+        if now >= self.reset:
+            self.tokens = float(self.limit)
+            self.reset = now + self.period
+
+    def update(self, limit: int, remaining: int, reset: float) -> None:
+        """Synchronize the bucket with rate limit values returned by the instance."""
+        self.limit = limit
+        self.tokens = float(remaining)
+        self.reset = reset
+        self._refill()
+
+    def exhaust(self, reset: float = None) -> None:
+        """Mark the bucket as empty until the rate limit window resets."""
+        self.tokens = 0.0
+        if reset and reset > self.clock():
+            self.reset = reset
+
+    def consume(self) -> None:
+        """Remove a token from the bucket."""
+        self._refill()
+        self.tokens = max(self.tokens - 1, 0.0)
+
+    def delay(self) -> float:
+        """Returns the number of seconds to wait before the next request.
+
+        Once fewer than ``pace_threshold`` of the requests in a window
+        remain, the remaining requests are spread evenly over the time
+        left until the window resets.
+        """
+        self._refill()
+        remaining_time: float = max(self.reset - self.clock(), 0.0)
+        if self.tokens < 1:
+            return remaining_time
+
+        if self.tokens < self.limit * self.pace_threshold:
+            return remaining_time / self.tokens
+
+        return 0.0
+
+
+class PostScheduler:
+    """Rate Limit Aware Mastodon Post Scheduler.
+
+    Keeps a token bucket per Mastodon instance and account, spaces and
+    jitters posts to stay under the instance's rate limits and retries
+    posts that fail due to rate limiting (HTTP 429), server errors (HTTP
+    5xx) or network errors with exponential backoff. Each post uses an
+    idempotency key so that a retried post is not published twice.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = 1.0,
+        jitter: float = 1.0,
+        max_retries: int = 3,
+        backoff: float = 2.0,
+        max_wait: float = 300.0,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """Class initialization method."""
+        self.min_interval: float = min_interval
+        self.jitter: float = jitter
+        self.max_retries: int = max_retries
+        self.backoff: float = backoff
+        self.max_wait: float = max_wait
+        self.clock: Callable[[], float] = clock
+        self.sleep: Callable[[float], None] = sleep
+        self._buckets: dict[tuple[str | None, str | None, str | None], TokenBucket] = {}
+        self._last_post: dict[tuple[str | None, str | None, str | None], float] = {}
+
+    def bucket(self, client: MastodonClient) -> TokenBucket:
+        """Returns the token bucket for a client's instance and account."""
+        if client.account_key not in self._buckets:
+            self._buckets[client.account_key] = TokenBucket(clock=self.clock)
+
+        return self._buckets[client.account_key]
+
+    def _wait(self, client: MastodonClient) -> None:
+        """Wait until a post can be made without exceeding the rate limit."""
+        delay: float = self.bucket(client).delay()
+        last_post: float | None = self._last_post.get(client.account_key)
+        if last_post is not None:
+            delay = max(delay, self.min_interval - (self.clock() - last_post))
+
+        if delay > 0 or last_post is not None:
+            delay = max(delay, 0.0) + random.uniform(0, self.jitter)  # noqa: S311
+
+        if delay > 0:
+            self.sleep(min(delay, self.max_wait))
+
+    def _sync(self, client: MastodonClient) -> None:
+        """Synchronize a token bucket with the client's last rate limit values."""
+        rate_limit: tuple[int, int, float] | None = client.rate_limit
+        # Mastodon.py sets the reset time to a time in the past until a
+        # response with rate limit headers has been received
+        if rate_limit and rate_limit[2] > self.clock():
+            limit, remaining, reset = rate_limit
+            self.bucket(client).update(limit=limit, remaining=remaining, reset=reset)
+
+    def post(
+        self,
+        client: MastodonClient,
+        content: str,
+        sensitive: bool = False,
+        visibility: str = "public",
+        spoiler_text: str = None,
+    ) -> None:
+        """Post content using a client, waiting for and retrying as required."""
+        import uuid
+
+        from mastodon import MastodonNetworkError, MastodonRatelimitError, MastodonServerError
+
+        idempotency_key: str = str(uuid.uuid4())
+        attempt: int = 0
+        while True:
+            self._wait(client)
+            self.bucket(client).consume()
+            try:
+                client.post(
+                    content=content,
+                    sensitive=sensitive,
+                    visibility=visibility,
+                    spoiler_text=spoiler_text,
+                    idempotency_key=idempotency_key,
+                )
+            except MastodonRatelimitError:
+                self._last_post[client.account_key] = self.clock()
+                self._sync(client)
+                self.bucket(client).exhaust()
+                if attempt >= self.max_retries:
+                    raise
+            except (MastodonServerError, MastodonNetworkError):
+                self._last_post[client.account_key] = self.clock()
+                self._sync(client)
+                if attempt >= self.max_retries:
+                    raise
+
+                self.sleep(min(self.backoff * 2**attempt, self.max_wait))
+            else:
+                self._last_post[client.account_key] = self.clock()
+                self._sync(client)
+                return
+
+            attempt += 1
+
+    def __str__(self) -> str:
+        return self.__class__.__name__
@@ -0,0 +1,163 @@
+# Copyright (c) 2022-2024 Linh Pham
+# mastodon-podcast-bot is released under the terms of the MIT License
+# SPDX-License-Identifier: MIT
+#
+# vim: set noai syntax=python ts=4 sw=4:
+"""Feed Processing Metrics Module."""
+import json
+import time
+from pathlib import Path
+from typing import Any
+
+# Metric name, type, help text and FeedMetrics attribute
+_PROMETHEUS_METRICS: tuple[tuple[str, str, str, str], ...] = (
+    (
+        "podcast_bot_feed_last_run_timestamp_seconds",
+        "gauge",
+        "Time the feed was last processed.",
+        "timestamp",
+    ),
+    (
+        "podcast_bot_feed_fetch_seconds",
+        "gauge",
+        "Time taken to receive the feed response headers.",
+        "fetch_time",
+    ),
+    (
+        "podcast_bot_feed_downloaded_bytes",
+        "gauge",
+        "Number of bytes of the feed response body read.",
+        "bytes_downloaded",
+    ),
+    (
+        "podcast_bot_feed_parse_seconds",
+        "gauge",
+        "Time taken to read and parse the feed response body.",
+        "parse_time",
+    ),
+    ("podcast_bot_feed_episodes", "gauge", "Number of episodes parsed from the feed.", "episodes"),
+    (
+        "podcast_bot_feed_dedup_hits",
+        "gauge",
+        "Number of recent episodes already in the feed database.",
+        "dedup_hits",
+    ),
+    (
+        "podcast_bot_feed_dedup_misses",
+        "gauge",
+        "Number of recent episodes not in the feed database.",
+        "dedup_misses",
+    ),
+    (
+        "podcast_bot_feed_render_seconds",
+        "gauge",
+        "Time taken to format posts for new episodes.",
+        "render_time",
+    ),
+    ("podcast_bot_feed_posts", "gauge", "Number of posts made for new episodes.", "posts"),
+    (
+        "podcast_bot_feed_post_seconds",
+        "gauge",
+        "Time taken to post new episodes, including rate limit waits and retries.",
+        "post_time",
+    ),
+    (
+        "podcast_bot_feed_db_commit_seconds",
+        "gauge",
+        "Time taken to write changes to the feed database.",
+        "commit_time",
+    ),
+    (
+        "podcast_bot_feed_not_modified",
+        "gauge",
+        "Whether the feed was not modified since the previous fetch.",
+        "not_modified",
+    ),
+    ("podcast_bot_feed_failed", "gauge", "Whether processing the feed failed.", "failed"),
+)
+
+
+class FeedMetrics:
+    """Podcast Feed Processing Metrics.
+
+    Times are recorded in seconds.
+    """
+
+    def __init__(self, name: str) -> None:
+        """Class initialization method."""
+        self.name: str = name
+        self.timestamp: float = time.time()
+        self.fetch_time: float = 0.0
+        self.bytes_downloaded: int = 0
+        self.parse_time: float = 0.0
+        self.episodes: int = 0
+        self.dedup_hits: int = 0
+        self.dedup_misses: int = 0
+        self.render_time: float = 0.0
+        self.posts: int = 0
+        self.post_time: float = 0.0
+        self.commit_time: float = 0.0
+        self.not_modified: bool = False
+        self.failed: bool = False
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returns the feed metrics as a dictionary."""
+        return dict(vars(self))
+
+    def __str__(self) -> str:
+        return self.__class__.__name__
+
+
+class RunMetrics:
+    """Feed Processing Run Metrics.
+
+    Keeps the metrics from the most recent run of each feed and exports
+    them as a Prometheus textfile collector file or a JSON run report.
+    """
+
+    def __init__(self) -> None:
+        """Class initialization method."""
+        self.feeds: dict[str, FeedMetrics] = {}
+
+    def add(self, feed_metrics: FeedMetrics) -> None:
+        """Add or replace the metrics for a feed."""
+        self.feeds[feed_metrics.name] = feed_metrics
+
+    def _write(self, path: str, content: str) -> None:
+        """Write a file atomically so that readers never see a partial file."""
+        file_path: Path = Path(path)
+        temp_path: Path = file_path.with_name(f".{file_path.name}.tmp")
+        temp_path.write_text(content, encoding="utf-8")
+        temp_path.replace(file_path)
+
+    def prometheus(self) -> str:
+        """Returns the metrics in the Prometheus text exposition format."""
+        lines: list[str] = []
+        for metric, metric_type, help_text, attribute in _PROMETHEUS_METRICS:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {metric_type}")
+            for name, feed_metrics in self.feeds.items():
+                label: str = name.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+                lines.append(
+                    f'{metric}{{feed="{label}"}} {float(getattr(feed_metrics, attribute))}'
+                )
+
+        return "\n".join(lines) + "\n"
+
+    def report(self) -> dict[str, Any]:
+        """Returns the metrics as a run report."""
+        return {
+            "timestamp": time.time(),
+            "feeds": [feed_metrics.as_dict() for feed_metrics in self.feeds.values()],
+        }
+
+    def write_prometheus(self, path: str) -> None:
+        """Write the metrics to a Prometheus textfile collector file."""
+        self._write(path, self.prometheus())
+
+    def write_report(self, path: str) -> None:
+        """Write the metrics to a JSON run report file."""
+        self._write(path, json.dumps(self.report(), indent=2))
+
+    def __str__(self) -> str:
+        return self.__class__.__name__
@@ -3,251 +3,615 @@
 # SPDX-License-Identifier: MIT
 #
 # vim: set noai syntax=python ts=4 sw=4:
+# pylint: disable=C0415
 """Mastodon Podcast Feed Bot."""
 import logging
+import os
+import signal
 import sys
+import time
 from argparse import Namespace
+from collections.abc import Iterator
 from datetime import datetime, timedelta
-from pprint import pformat
-from typing import Any
-
-from html2text import HTML2Text
-from jinja2 import Environment, FileSystemLoader, Template, select_autoescape
+from threading import Event, Thread
+from typing import TYPE_CHECKING, Any
 
 from command import AppCommand
-from config import AppConfig, AppEnvironment, FeedSettings
-from db import FeedDatabase
-from feed import PodcastFeed
-from mastodon_client import MastodonClient
+from config import AppConfig, AppEnvironment, FeedIndex, FeedSettings
+from db import FeedDatabase, FeedDatabaseRegistry, FeedLeases
+from feed import CircuitBreaker, Episode, FeedFetcher, FetchResult
+from log_handlers import LogHandlerRegistry, PrettyFormat
+from mastodon_client import MastodonClient, MastodonClientPool, PostScheduler
+from metrics import FeedMetrics, RunMetrics
+from render import PostRenderer, unsmart_quotes
+from scheduler import FeedScheduler, PollResult
+
+if TYPE_CHECKING:
+    from logging.handlers import QueueHandler
+
+    from jinja2 import Template
 
 APP_VERSION: str = "2.1.2"
 logger: logging.Logger = logging.getLogger(__name__)
+_default_renderer: PostRenderer = PostRenderer()
 
 
 def retrieve_new_episodes(
-    feed_episodes: list[dict[str, Any]],
+    feed_episodes: list[Episode],
     feed_database: FeedDatabase,
     feed_name: str = None,
     guid_filter: str = "",
     days: int = 7,
     dry_run: bool = False,
-) -> list[dict[str, Any]]:
-    """Retrieve new episodes from a podcast feed."""
-    seen_guids: list[str] = feed_database.retrieve_guids(feed_name=feed_name)
-    seen_enclosure_urls: list[str] = feed_database.retrieve_enclosure_urls(feed_name=feed_name)
-
-    logger.debug("Seen GUIDs:\n%s", pformat(seen_guids, compact=True))
-    logger.debug("Seen Enclosure URLs:\n%s", pformat(seen_enclosure_urls, compact=True))
-
-    episodes: list[dict[str, Any]] = []
-
-    for episode in feed_episodes:
-        guid: str = episode["guid"]
-        enclosure_url: str = episode["enclosures"][0]["url"].strip()
-        publish_date: datetime = datetime.fromtimestamp(episode["published"])
-
-        if datetime.now() - publish_date <= timedelta(days=days):
-            # Only process episodes in which the GUID or the enclosure URL are
-            # not in the episodes database table
-            if guid not in seen_guids or enclosure_url not in seen_enclosure_urls:
-                # Use guid_filter to match against the episode GUID to filter
-                # out any random or incorrect GUIDs. This is a workaround to
-                # reduce issues encountered with American Public Media feeds
-                if guid_filter is not None and guid_filter.lower() in guid.lower():
-                    info: dict[str, Any] = {
-                        "guid": guid,
-                        "published": publish_date,
-                        "title": episode["title"].strip(),
-                        "duration": timedelta(seconds=episode["total_time"]),
-                        "url": enclosure_url,
-                    }
-
-                    if "description_html" in episode:
-                        info["description"] = episode["description_html"].strip()
-                    else:
-                        info["description"] = episode["description"].strip()
+    metrics: FeedMetrics = None,
+) -> list[Episode]:
+    """Retrieve new episodes from a podcast feed.
+
+    If provided, the number of recent episodes that are and are not in
+    the episodes database table are recorded in ``metrics``.
+    """
+    published_after: float = (datetime.now() - timedelta(days=days)).timestamp()
+    recent_episodes: list[Episode] = [
+        episode for episode in feed_episodes if episode.published >= published_after
+    ]
+
+    # Only look up the GUIDs and enclosure URLs of recent episodes in the
+    # episodes database table
+    unseen_guids, unseen_enclosure_urls = feed_database.retrieve_unseen(
+        guids=[episode.guid for episode in recent_episodes],
+        enclosure_urls=[episode.url for episode in recent_episodes],
+        feed_name=feed_name,
+    )
 
-                    episodes.append(info)
-                    logger.debug(
-                        "Episode info for GUID %s:\n%s",
-                        guid,
-                        pformat(info, sort_dicts=False, compact=True),
-                    )
+    logger.debug("Unseen GUIDs:\n%s", PrettyFormat(unseen_guids, compact=True))
+    logger.debug("Unseen Enclosure URLs:\n%s", PrettyFormat(unseen_enclosure_urls, compact=True))
+
+    episodes: list[Episode] = []
+
+    for episode in recent_episodes:
+        guid: str = episode.guid
+        enclosure_url: str = episode.url
+
+        # Only process episodes in which the GUID or the enclosure URL are
+        # not in the episodes database table
+        if guid in unseen_guids or enclosure_url in unseen_enclosure_urls:
+            if metrics:
+                metrics.dedup_misses += 1
+
+            # Use guid_filter to match against the episode GUID to filter
+            # out any random or incorrect GUIDs. This is a workaround to
+            # reduce issues encountered with American Public Media feeds
+            if guid_filter is not None and guid_filter.lower() in guid.lower():
+                episodes.append(episode)
+                logger.debug(
+                    "Episode info for GUID %s:\n%s",
+                    guid,
+                    PrettyFormat(episode._asdict(), sort_dicts=False, compact=True),
+                )
 
-                    if not dry_run:
-                        # Only add the enclosure URL if it's not already in
-                        # the episodes table to prevent duplicate entries.
-                        if enclosure_url not in seen_enclosure_urls:
-                            feed_database.insert(
-                                guid=guid,
-                                enclosure_url=enclosure_url,
-                                feed_name=feed_name,
-                                timestamp=datetime.now(),
-                            )
-                        else:
-                            feed_database.insert(
-                                guid=guid,
-                                feed_name=feed_name,
-                                timestamp=datetime.now(),
-                            )
+                if not dry_run:
+                    # Only add the enclosure URL if it's not already in
+                    # the episodes table to prevent duplicate entries.
+                    if enclosure_url in unseen_enclosure_urls:
+                        feed_database.insert(
+                            guid=guid,
+                            enclosure_url=enclosure_url,
+                            feed_name=feed_name,
+                            timestamp=datetime.now(),
+                        )
+                    else:
+                        feed_database.insert(
+                            guid=guid,
+                            feed_name=feed_name,
+                            timestamp=datetime.now(),
+                        )
+        elif metrics:
+            metrics.dedup_hits += 1
 
     return episodes
 
 
-def unsmart_quotes(text: str) -> str:
-    """Replaces "smart" quotes with normal quotes."""
-    text: str = text.replace("’", "'")
-    text = text.replace("”", '"')
-    text = text.replace("“", '"')
-    return text
-
-
 def format_post(
-    episode: dict[str, Any],
+    episode: Episode,
     podcast_name: str = None,
     max_description_length: int = 275,
     template_path: str = "templates",
     template_file: str = "post.txt.jinja",
+    renderer: PostRenderer = None,
 ) -> str:
-    """Returns a formatted post with episode information."""
-    formatter: HTML2Text = HTML2Text()
-    formatter.ignore_emphasis = True
-    formatter.ignore_images = True
-    formatter.ignore_links = True
-    formatter.ignore_tables = True
-    formatter.body_width = 0
-
-    env: Environment = Environment(
-        loader=FileSystemLoader(template_path),
-        autoescape=select_autoescape(),
-        trim_blocks=True,
-        lstrip_blocks=True,
-    )
-    template: Template = env.get_template(template_file)
+    """Returns a formatted post with episode information.
 
-    # Replace "smart" quotes with regular quotes
-    title: str = unsmart_quotes(text=episode["title"])
-    description: str = unsmart_quotes(text=episode["description"])
-    formatted_description: str = formatter.handle(description)
+    Templates are compiled once and reused through the provided renderer,
+    or a renderer shared by all calls if one is not provided.
+    """
+    if not renderer:
+        renderer = _default_renderer
 
-    # Fix issue with HTML2Text causing + to be rendered as \+
-    formatted_description = formatted_description.replace(r"\+", "+")
+    template: Template = renderer.get_template(
+        template_directory=template_path, template_file=template_file
+    )
 
-    if len(formatted_description) > max_description_length:
-        formatted_description = f"{formatted_description[:max_description_length].strip()}...\n"
-    else:
-        formatted_description = f"{formatted_description.strip()}\n"
+    # Replace "smart" quotes with regular quotes. Only as much of the
+    # description as is needed for the post is converted to text
+    title: str = unsmart_quotes(text=episode.title)
+    formatted_description: str = renderer.format_description(
+        episode.description, max_length=max_description_length
+    )
 
     return template.render(
         podcast_name=podcast_name,
         title=title,
         description=formatted_description,
-        url=episode["url"],
+        url=episode.url,
     )
 
 
-def main() -> None:
-    """Fetch podcast episodes and post new episodes."""
-    arguments: Namespace = AppCommand().parse()
-    if arguments.version:
-        print(f"Version {APP_VERSION}")
-        return
-
-    if arguments.multiple_feeds:
-        feeds: list[FeedSettings] = AppConfig().parse()
-    else:
-        feeds: list[FeedSettings] = AppEnvironment().parse()
-
-    if not feeds or not isinstance(feeds, list):
-        print("ERROR: No podcast feed(s) defined.")
-        sys.exit(1)
-
-    dry_run: bool = arguments.dry_run
-
-    for feed in feeds:
-        if feed.log_file:
-            log_handler: logging.FileHandler = logging.FileHandler(feed.log_file)
-            log_format: logging.Formatter = logging.Formatter(
-                fmt="%(asctime)s %(levelname)s %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+class FeedRunner:
+    """Fetches, processes and posts new episodes for podcast feeds.
+
+    Holds the state shared between feeds and between runs, such as
+    database connections, Mastodon clients and compiled templates.
+    """
+
+    def __init__(self, arguments: Namespace, databases: FeedDatabaseRegistry) -> None:
+        """Class initialization method."""
+        self.arguments: Namespace = arguments
+        self.dry_run: bool = arguments.dry_run
+        self.databases: FeedDatabaseRegistry = databases
+        self.renderer: PostRenderer = PostRenderer(
+            bytecode_cache_directory=arguments.template_cache
+        )
+        self.mastodon_clients: MastodonClientPool = MastodonClientPool()
+        self.post_scheduler: PostScheduler = PostScheduler()
+        self.metrics: RunMetrics = RunMetrics()
+
+        # Leases on feeds held in a shared database, so that a feed is only
+        # processed by one worker at a time
+        self.leases: FeedLeases | None = None
+        if arguments.lease_db:
+            import socket
+
+            self.leases = FeedLeases(
+                arguments.lease_db,
+                owner=arguments.worker_id or f"{socket.gethostname()}:{os.getpid()}",
+                ttl=arguments.lease_ttl,
             )
-            log_handler.setFormatter(log_format)
-            if arguments.debug:
-                logger.setLevel(logging.DEBUG)
-            else:
-                logger.setLevel(logging.INFO)
-
-            logger.addHandler(log_handler)
 
+        # Held leases are renewed by a background thread for the lifetime
+        # of the runner, as processing feeds, which includes waiting on
+        # Mastodon rate limits, and waiting between polls can both take
+        # longer than the lease TTL
+        self._heartbeat_stop: Event = Event()
+        self._heartbeat: Thread | None = None
+        if self.leases:
+            self._heartbeat = Thread(
+                target=self._renew_leases, name="feed-lease-heartbeat", daemon=True
+            )
+            self._heartbeat.start()
+
+        # Feeds that use the same log file share a handler. Log records are
+        # written to log files by a background thread.
+        self.log_handlers: LogHandlerRegistry = LogHandlerRegistry(
+            fmt="%(asctime)s %(levelname)s %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+        )
+
+        # Fetch and parse enabled feeds concurrently. Results are returned
+        # in the same order as the feeds so that each feed is still
+        # processed, posted and stored in order. Keep-alive connections to
+        # feed hosts are reused for the lifetime of the runner.
+        self.fetcher: FeedFetcher = FeedFetcher(
+            max_workers=arguments.fetch_workers,
+            max_per_host=arguments.fetch_per_host,
+            episode_cache=arguments.episode_cache,
+            pool_size=arguments.pool_size,
+            pool_idle_timeout=arguments.pool_idle_timeout,
+            connect_timeout=arguments.connect_timeout,
+            read_timeout=arguments.read_timeout,
+            total_timeout=arguments.feed_timeout,
+            breaker=CircuitBreaker(
+                failure_threshold=arguments.breaker_failures,
+                reset_timeout=arguments.breaker_reset,
+            ),
+        )
+
+    def feed_database(self, feed: FeedSettings) -> FeedDatabase:
+        """Returns the shared connection to a feed's database.
+
+        The database file is created if the file does not exist.
+        """
+        return self.databases.get(
+            feed.database_file,
+            wal_mode=feed.database_wal_mode,
+            busy_timeout=feed.database_busy_timeout,
+        )
+
+    def run(
+        self,
+        feeds: list[FeedSettings],
+        isolate_errors: bool = False,
+        shutdown: Event = None,
+    ) -> list[PollResult]:
+        """Fetch and process podcast feeds, returning a result for each feed.
+
+        If ``isolate_errors`` is set, an error processing a feed is logged
+        and recorded in its result instead of being raised. If the
+        ``shutdown`` event is set, no further feeds are processed.
+        """
+        # Feeds leased by another worker are neither fetched nor processed.
+        # If errors are isolated, an error claiming leases or opening a
+        # feed's database fails only the affected feeds, which are not
+        # fetched and are recorded as failed when processed.
+        errors: dict[int, Exception] = {}
+        unclaimed: set[str] = set()
+        if self.leases:
+            try:
+                unclaimed = self.claim(feeds)
+            except Exception as error:  # pylint: disable=broad-except
+                if not isolate_errors:
+                    raise
+
+                errors = {index: error for index, feed in enumerate(feeds) if feed.enabled}
+
+        # Stored ETag and Last-Modified values allow unchanged feeds to be skipped
+        validators: list[tuple[str | None, str | None, str | None]] = []
+        for index, feed in enumerate(feeds):
+            if not feed.enabled or feed.name in unclaimed or index in errors:
+                validators.append((None, None, None))
+                continue
+
+            try:
+                validators.append(
+                    self.feed_database(feed).retrieve_validators(
+                        feed_name=feed.name, feed_url=feed.feed_url
+                    )
+                )
+            except Exception as error:  # pylint: disable=broad-except
+                if not isolate_errors:
+                    raise
+
+                errors[index] = error
+                validators.append((None, None, None))
+
+        fetch_results: Iterator[FetchResult] = self.fetcher.fetch_all(
+            [
+                (
+                    feed._replace(enabled=False)
+                    if feed.name in unclaimed or index in errors
+                    else feed
+                )
+                for index, feed in enumerate(feeds)
+            ],
+            validators=validators,
+        )
+
+        results: list[PollResult] = []
+        for index, (feed, fetch_result) in enumerate(zip(feeds, fetch_results)):
+            if shutdown and shutdown.is_set():
+                break
+
+            if index in errors:
+                fetch_result = FetchResult(error=errors[index])
+
+            log_handler: QueueHandler | None = None
+            if feed.log_file:
+                log_handler = self.log_handlers.get(feed.log_file)
+                if self.arguments.debug:
+                    logger.setLevel(logging.DEBUG)
+                else:
+                    logger.setLevel(logging.INFO)
+
+                logger.addHandler(log_handler)
+
+            try:
+                results.append(
+                    self._run_feed(
+                        feed,
+                        fetch_result,
+                        isolate_errors=isolate_errors,
+                        leased=feed.name in unclaimed,
+                    )
+                )
+            finally:
+                if log_handler:
+                    logger.removeHandler(log_handler)
+
+        self.export_metrics()
+        return results
+
+    def claim(self, feeds: list[FeedSettings]) -> set[str]:
+        """Claim or renew leases on enabled feeds.
+
+        Returns the names of the feeds leased by another worker.
+        """
+        names: list[str] = [feed.name for feed in feeds if feed.enabled]
+        return set(names) - self.leases.claim(names)
+
+    def _renew_leases(self) -> None:
+        """Renew held leases every heartbeat until the runner is closed.
+
+        Errors are logged rather than raised, as the lease on a feed is
+        claimed again before the feed is processed.
+        """
+        while not self._heartbeat_stop.wait(self.leases.heartbeat):
+            try:
+                self.leases.renew()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Error renewing feed leases.")
+
+    def _run_feed(
+        self,
+        feed: FeedSettings,
+        fetch_result: FetchResult,
+        isolate_errors: bool = False,
+        leased: bool = False,
+    ) -> PollResult:
+        """Process a fetched podcast feed, logging to the feed's log file.
+
+        Feeds that are ``leased`` by another worker are skipped.
+        """
         logger.debug("Starting")
-        if dry_run:
+        if self.dry_run:
             logger.debug("Dry Run: true")
 
         logger.debug("Podcast Name: %s", feed.podcast_name)
 
-        if feed.enabled:
-            # Check to see if the feed database file exists. Create file if
-            # the file does not exist
-            feed_database: FeedDatabase = FeedDatabase(feed.database_file)
-
-            # Pull episodes from the configured podcast feed
-            podcast: PodcastFeed = PodcastFeed()
-            episodes: list[dict[str, Any]] = podcast.fetch(
-                feed_url=feed.feed_url,
-                max_episodes=feed.max_episodes,
-                user_agent=feed.user_agent,
+        if not feed.enabled:
+            logger.debug("Feed disabled. Skipping.")
+            return PollResult()
+
+        if leased:
+            logger.debug("Feed leased by another worker. Skipping.")
+            return PollResult()
+
+        feed_metrics: FeedMetrics = FeedMetrics(name=feed.name)
+        try:
+            # The lease is claimed again in case it expired and was claimed
+            # by another worker while earlier feeds were processed
+            if self.leases and not self.leases.claim([feed.name]):
+                logger.debug("Feed lease lost to another worker. Skipping.")
+                return PollResult()
+
+            self.metrics.add(feed_metrics)
+            result: PollResult = self.process(
+                feed=feed, fetch_result=fetch_result, metrics=feed_metrics
             )
-            logger.debug("Feed URL: %s", feed.feed_url)
-
-            # Connect to Mastodon Client
-            logger.debug("Mastodon URL: %s", feed.mastodon_api_base_url)
-            if feed.mastodon_use_secrets_file:
-                mastodon_client: MastodonClient = MastodonClient(
-                    api_url=feed.mastodon_api_base_url,
-                    client_secret=None,
-                    access_token=feed.mastodon_secrets_file,
-                )
-            else:
-                mastodon_client: MastodonClient = MastodonClient(
-                    api_url=feed.mastodon_api_base_url,
-                    client_secret=feed.mastodon_client_secret,
-                    access_token=feed.mastodon_access_token,
+        except Exception:  # pylint: disable=broad-except
+            feed_metrics.failed = True
+            self.metrics.add(feed_metrics)
+            if not isolate_errors:
+                self.export_metrics()
+                raise
+
+            logger.exception("Error processing feed %s.", feed.name)
+            result = PollResult(failed=True)
+
+        logger.debug("Finished")
+        return result
+
+    def export_metrics(self) -> None:
+        """Write the latest metrics for each feed to the configured files."""
+        if self.arguments.metrics_file:
+            self.metrics.write_prometheus(self.arguments.metrics_file)
+
+        if self.arguments.report_file:
+            self.metrics.write_report(self.arguments.report_file)
+
+    def process(
+        self, feed: FeedSettings, fetch_result: FetchResult, metrics: FeedMetrics = None
+    ) -> PollResult:
+        """Process new episodes from a fetched podcast feed and post them.
+
+        If provided, timings and counts for each stage are recorded in
+        ``metrics``.
+        """
+        if not metrics:
+            metrics = FeedMetrics(name=feed.name)
+
+        metrics.fetch_time = fetch_result.fetch_time
+        metrics.parse_time = fetch_result.parse_time
+        metrics.bytes_downloaded = fetch_result.bytes_downloaded
+
+        # Episodes pulled from the configured podcast feed
+        if fetch_result.error:
+            raise fetch_result.error
+
+        feed_database: FeedDatabase = self.feed_database(feed)
+
+        logger.debug("Feed URL: %s", feed.feed_url)
+
+        # Skip parsing, dedup and cleanup if the feed has not changed
+        if fetch_result.not_modified:
+            logger.debug("Feed not modified since last fetch. Skipping.")
+            metrics.not_modified = True
+
+            # A feed matching the stored content hash was sent in full, so
+            # its validators may have changed. Storing them allows the next
+            # request to be answered with a 304 response.
+            if fetch_result.content_hash and not self.dry_run:
+                commit_time: float = feed_database.commit_time
+                feed_database.store_validators(
+                    feed_name=feed.name,
+                    feed_url=feed.feed_url,
+                    etag=fetch_result.etag,
+                    last_modified=fetch_result.last_modified,
+                    content_hash=fetch_result.content_hash,
                 )
+                metrics.commit_time = feed_database.commit_time - commit_time
+
+            return PollResult(not_modified=True)
+
+        episodes: list[Episode] = fetch_result.episodes
+        metrics.episodes = len(episodes) if episodes else 0
 
+        # Shared Mastodon client for the feed's account. The client
+        # only connects when the first post is made
+        logger.debug("Mastodon URL: %s", feed.mastodon_api_base_url)
+        if feed.mastodon_use_secrets_file:
+            mastodon_client: MastodonClient = self.mastodon_clients.get(
+                api_url=feed.mastodon_api_base_url,
+                client_secret=None,
+                access_token=feed.mastodon_secrets_file,
+            )
+        else:
+            mastodon_client: MastodonClient = self.mastodon_clients.get(
+                api_url=feed.mastodon_api_base_url,
+                client_secret=feed.mastodon_client_secret,
+                access_token=feed.mastodon_access_token,
+            )
+
+        # Record new episodes, clean up old entries and store the feed's
+        # HTTP validators in a single database transaction before any
+        # posts are made
+        new_episodes: list[Episode] = []
+        commit_time: float = feed_database.commit_time
+        with feed_database.unit_of_work():
             if episodes:
-                new_episodes: list[dict[str, Any]] = retrieve_new_episodes(
+                new_episodes = retrieve_new_episodes(
                     feed_episodes=episodes,
                     feed_database=feed_database,
                     feed_name=feed.name,
                     guid_filter=feed.guid_filter,
                     days=feed.recent_days,
-                    dry_run=dry_run,
+                    dry_run=self.dry_run,
+                    metrics=metrics,
                 )
-                new_episodes.reverse()
-
-                logger.debug("New Episodes:\n%s", pformat(new_episodes))
-
-                for episode in new_episodes:
-                    episode["title"] = unsmart_quotes(text=episode["title"])
-                    post_text: str = format_post(
-                        podcast_name=feed.podcast_name,
-                        episode=episode,
-                        max_description_length=feed.max_description_length,
-                        template_path=feed.template_directory,
-                        template_file=feed.template_file,
-                    )
-                    if not dry_run:
-                        logger.info("Posting %s.", episode)
-                        mastodon_client.post(content=post_text)
 
-            if not dry_run or not arguments.skip_clean:
+            if not self.dry_run or not self.arguments.skip_clean:
                 feed_database.clean(days_to_keep=feed.database_clean_days)
 
-            logger.debug("Finished")
-        else:
-            logger.debug("Feed disabled. Skipping.")
+            if not self.dry_run:
+                feed_database.store_validators(
+                    feed_name=feed.name,
+                    feed_url=feed.feed_url,
+                    etag=fetch_result.etag,
+                    last_modified=fetch_result.last_modified,
+                    content_hash=fetch_result.content_hash,
+                )
+
+        metrics.commit_time = feed_database.commit_time - commit_time
+
+        new_episodes.reverse()
+        logger.debug("New Episodes:\n%s", PrettyFormat(new_episodes))
+
+        for episode in new_episodes:
+            start: float = time.perf_counter()
+            post_text: str = format_post(
+                podcast_name=feed.podcast_name,
+                episode=episode,
+                max_description_length=feed.max_description_length,
+                template_path=feed.template_directory,
+                template_file=feed.template_file,
+                renderer=self.renderer,
+            )
+            metrics.render_time += time.perf_counter() - start
+            if not self.dry_run:
+                logger.info("Posting %s.", episode)
+                start = time.perf_counter()
+                self.post_scheduler.post(client=mastodon_client, content=post_text)
+                metrics.post_time += time.perf_counter() - start
+                metrics.posts += 1
+
+        return PollResult(
+            published=tuple(episode.published for episode in episodes if episode.published),
+            new_episodes=len(new_episodes),
+        )
+
+    def close(self) -> None:
+        """Close connections to podcast feed hosts and write any queued log records.
+
+        Leases held on feeds are released.
+        """
+        self.fetcher.close()
+        if self._heartbeat:
+            self._heartbeat_stop.set()
+            self._heartbeat.join()
+
+        if self.leases:
+            self.leases.close()
+
+        self.log_handlers.close()
+
+    def __str__(self) -> str:
+        return self.__class__.__name__
+
+
+def run_daemon(runner: FeedRunner, feeds: list[FeedSettings]) -> None:
+    """Poll enabled feeds on adaptive per-feed schedules until stopped.
+
+    SIGTERM and SIGINT stop the daemon once the feed being processed has
+    finished.
+    """
+    shutdown: Event = Event()
 
-        log_handler.close()
-        logger.removeHandler(log_handler)
+    def _shutdown(signal_number: int, _frame: Any) -> None:
+        logger.info("Received signal %d. Shutting down.", signal_number)
+        shutdown.set()
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+
+    scheduler: FeedScheduler = FeedScheduler([feed for feed in feeds if feed.enabled])
+    while not shutdown.is_set():
+        due_feeds: list[FeedSettings] = scheduler.pop_due()
+        if not due_feeds:
+            next_poll: float | None = scheduler.next_poll_time()
+            if next_poll is None:
+                return
+
+            shutdown.wait(max(next_poll - time.time(), 0))
+            continue
+
+        results: list[PollResult] = runner.run(due_feeds, isolate_errors=True, shutdown=shutdown)
+        for feed, result in zip(due_feeds, results):
+            interval: float = scheduler.reschedule(feed, result)
+            logger.debug("Next poll of %s in %d seconds.", feed.name, interval)
+
+
+def main() -> None:
+    """Fetch podcast episodes and post new episodes."""
+    arguments: Namespace = AppCommand().parse()
+    if arguments.version:
+        print(f"Version {APP_VERSION}")
+        return
+
+    if arguments.multiple_feeds:
+        feeds: list[FeedSettings] = AppConfig().parse(
+            feeds_file=arguments.feeds_file, cache_file=arguments.config_cache
+        )
+    else:
+        feeds: list[FeedSettings] = AppEnvironment().parse()
+
+    if not feeds or not isinstance(feeds, list):
+        print("ERROR: No podcast feed(s) defined.")
+        sys.exit(1)
+
+    if arguments.feed_names or arguments.feed_tags:
+        feeds = FeedIndex(feeds).select(names=arguments.feed_names, tags=arguments.feed_tags)
+        if not feeds:
+            print("ERROR: No podcast feed(s) match the requested feed names or tags.")
+            sys.exit(1)
+
+    if arguments.shard:
+        shard_index, shard_count = arguments.shard
+        feeds = FeedIndex(feeds).shard(shard_index=shard_index, shard_count=shard_count)
+        if not feeds:
+            print(f"No podcast feed(s) assigned to shard {shard_index}/{shard_count}.")
+            return
+
+    # Each feed database file is opened once and shared between feeds
+    with FeedDatabaseRegistry() as databases:
+        runner: FeedRunner = FeedRunner(arguments=arguments, databases=databases)
+        try:
+            if arguments.daemon:
+                run_daemon(runner=runner, feeds=feeds)
+            else:
+                # A failed feed does not stop the remaining feeds from being
+                # processed, but is reported in the exit status
+                results: list[PollResult] = runner.run(feeds, isolate_errors=True)
+                if any(result.failed for result in results):
+                    sys.exit(1)
+        finally:
+            runner.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,145 @@
+# Copyright (c) 2022-2024 Linh Pham
+# mastodon-podcast-bot is released under the terms of the MIT License
+# SPDX-License-Identifier: MIT
+#
+# vim: set noai syntax=python ts=4 sw=4:
+# pylint: disable=C0415
+"""Post Rendering Module."""
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from html2text import HTML2Text
+    from jinja2 import BytecodeCache, Environment, Template
+
+# Approximate number of characters of HTML converted at a time when
+# converting a description with a maximum length. Chunks always end
+# right before a tag so that text is never split
+_DESCRIPTION_CHUNK_SIZE: int = 1024
+
+# Number of characters of converted text, past the maximum length, after
+# which the truncated text can no longer change. Only the last few
+# characters of the text can still change as more HTML is converted, such
+# as a partial "\+" or non-breaking space placeholder
+_DESCRIPTION_MARGIN: int = 32
+
+# Placeholder HTML2Text uses for non-breaking spaces until it finishes
+_NBSP_PLACEHOLDER: str = "&nbsp_place_holder;"
+
+
+def unsmart_quotes(text: str) -> str:
+    """Replaces "smart" quotes with normal quotes."""
+    text: str = text.replace("’", "'")
+    text = text.replace("”", '"')
+    text = text.replace("“", '"')
+    return text
+
+
+def _plain_text(text: str) -> str:
+    """Replace non-breaking space placeholders and escaped + characters."""
+    # Fix issue with HTML2Text causing + to be rendered as \+
+    return text.replace(_NBSP_PLACEHOLDER, " ").replace(r"\+", "+")
+
+
+class PostRenderer:
+    """Cached Post Template and Description Renderer.
+
+    Keeps one Jinja environment per template directory and one compiled
+    template per template directory and file for the life of the
+    renderer. If a bytecode cache directory is provided, compiled
+    templates are also cached on disk between runs.
+    """
+
+    def __init__(self, bytecode_cache_directory: str = None) -> None:
+        """Class initialization method."""
+        self._bytecode_cache: BytecodeCache | None = None
+        if bytecode_cache_directory:
+            from jinja2 import FileSystemBytecodeCache
+
+            Path(bytecode_cache_directory).mkdir(parents=True, exist_ok=True)
+            self._bytecode_cache = FileSystemBytecodeCache(bytecode_cache_directory)
+
+        self._environments: dict[str, Environment] = {}
+        self._templates: dict[tuple[str, str], Template] = {}
+
+    def get_template(
+        self, template_directory: str = "templates", template_file: str = "post.txt.jinja"
+    ) -> "Template":
+        """Returns the compiled template for a template directory and file."""
+        key: tuple[str, str] = (template_directory, template_file)
+        if key not in self._templates:
+            from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+            if template_directory not in self._environments:
+                self._environments[template_directory] = Environment(
+                    loader=FileSystemLoader(template_directory),
+                    autoescape=select_autoescape(),
+                    trim_blocks=True,
+                    lstrip_blocks=True,
+                    bytecode_cache=self._bytecode_cache,
+                )
+
+            self._templates[key] = self._environments[template_directory].get_template(
+                template_file
+            )
+
+        return self._templates[key]
+
+    def _formatter(self) -> "HTML2Text":
+        """Returns a new HTML to plain text formatter.
+
+        HTML2Text keeps parser state, such as open block quotes and lists,
+        between documents. A new formatter is created for each description
+        so that unclosed tags cannot carry over into the next one.
+        """
+        from html2text import HTML2Text
+
+        formatter: HTML2Text = HTML2Text()
+        formatter.ignore_emphasis = True
+        formatter.ignore_images = True
+        formatter.ignore_links = True
+        formatter.ignore_tables = True
+        formatter.body_width = 0
+        return formatter
+
+    def html_to_text(self, html: str) -> str:
+        """Convert an HTML episode description into plain text."""
+        return self._formatter().handle(html)
+
+    def format_description(self, html: str, max_length: int = 275) -> str:
+        """Convert an HTML episode description into plain text for a post.
+
+        Smart quotes are replaced and the text is truncated to
+        ``max_length`` characters, followed by "..." if it was truncated.
+        The description is converted in chunks and conversion stops once
+        the truncated text can no longer change, so only the start of a
+        long description is converted. The result is the same as
+        converting the whole description and then truncating it.
+        """
+        formatter: HTML2Text = self._formatter()
+        formatter.start = True
+        limit: int = max_length + _DESCRIPTION_MARGIN
+        position: int = 0
+        while position < len(html):
+            end: int = html.find("<", position + _DESCRIPTION_CHUNK_SIZE)
+            if end < 0:
+                end = len(html)
+
+            formatter.feed(unsmart_quotes(html[position:end]))
+            position = end
+
+            # Converted text only gets shorter once placeholders and escapes
+            # are replaced, so it is only joined once it may be long enough
+            if sum(map(len, formatter.outtextlist)) > limit:
+                text: str = _plain_text("".join(formatter.outtextlist))
+                if len(text) > limit:
+                    return f"{text[:max_length].strip()}...\n"
+
+        text = _plain_text(formatter.optwrap(formatter.finish()))
+        if len(text) > max_length:
+            return f"{text[:max_length].strip()}...\n"
+
+        return f"{text.strip()}\n"
+
+    def __str__(self) -> str:
+        return self.__class__.__name__
@@ -0,0 +1,130 @@
+# Copyright (c) 2022-2024 Linh Pham
+# mastodon-podcast-bot is released under the terms of the MIT License
+# SPDX-License-Identifier: MIT
+#
+# vim: set noai syntax=python ts=4 sw=4:
+"""Podcast Feed Polling Scheduler Module."""
+import heapq
+import time
+from collections.abc import Callable
+from statistics import median
+from typing import NamedTuple
+
+from config import FeedSettings
+
+
+class PollResult(NamedTuple):
+    """Podcast Feed Poll Result."""
+
+    published: tuple[float, ...] = ()
+    new_episodes: int = 0
+    not_modified: bool = False
+    failed: bool = False
+
+
+class FeedPollState:
+    """Podcast Feed Polling State."""
+
+    def __init__(self, interval: float) -> None:
+        """Class initialization method."""
+        self.interval: float = interval
+        self.cadence: float | None = None
+        self.last_published: float | None = None
+
+    def __str__(self) -> str:
+        return self.__class__.__name__
+
+
+class FeedScheduler:
+    """Adaptive Podcast Feed Polling Scheduler.
+
+    Keeps a priority queue of feeds ordered by their next poll time. Each
+    feed's polling interval adapts to its observed publishing cadence and
+    fetch history and is kept within the feed's minimum and maximum poll
+    interval settings:
+
+    - Feeds that just returned new episodes are polled again after the
+      minimum interval.
+    - Feeds with no changes, or that failed to fetch, back off
+      exponentially.
+    - Feeds are polled more often once a new episode is expected based
+      on the median time between recent episodes.
+    """
+
+    def __init__(
+        self,
+        feeds: list[FeedSettings],
+        backoff: float = 1.5,
+        polls_per_cadence: int = 8,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """Class initialization method."""
+        self.backoff: float = backoff
+        self.polls_per_cadence: int = polls_per_cadence
+        self.clock: Callable[[], float] = clock
+        self._states: dict[FeedSettings, FeedPollState] = {}
+        self._queue: list[tuple[float, int, FeedSettings]] = []
+        self._sequence: int = 0
+
+        now: float = clock()
+        for feed in feeds:
+            self._states[feed] = FeedPollState(interval=feed.min_poll_interval)
+            self._push(feed, now)
+
+    def _push(self, feed: FeedSettings, poll_time: float) -> None:
+        """Add a feed to the queue."""
+        heapq.heappush(self._queue, (poll_time, self._sequence, feed))
+        self._sequence += 1
+
+    def next_poll_time(self) -> float | None:
+        """Returns the time of the next scheduled poll."""
+        if not self._queue:
+            return None
+
+        return self._queue[0][0]
+
+    def pop_due(self) -> list[FeedSettings]:
+        """Remove and return all feeds that are due to be polled."""
+        now: float = self.clock()
+        due: list[FeedSettings] = []
+        while self._queue and self._queue[0][0] <= now:
+            due.append(heapq.heappop(self._queue)[2])
+
+        return due
+
+    def _update_cadence(self, state: FeedPollState, published: tuple[float, ...]) -> None:
+        """Update the publishing cadence of a feed using recent publish times."""
+        recent: list[float] = sorted(set(published), reverse=True)[:10]
+        if not recent:
+            return
+
+        state.last_published = recent[0]
+        if len(recent) > 1:
+            state.cadence = median(newer - older for newer, older in zip(recent, recent[1:]))
+
+    def reschedule(self, feed: FeedSettings, result: PollResult) -> float:
+        """Schedule the next poll of a feed and return the polling interval."""
+        state: FeedPollState = self._states[feed]
+        now: float = self.clock()
+        self._update_cadence(state, result.published)
+
+        interval: float = state.interval * self.backoff
+        if (
+            state.cadence
+            and state.last_published
+            and now >= state.last_published + state.cadence * 0.9
+        ):
+            # A new episode is expected soon based on the feed's cadence
+            interval = min(interval, state.cadence / self.polls_per_cadence)
+
+        if result.new_episodes:
+            interval = feed.min_poll_interval
+        elif result.failed:
+            interval = state.interval * 2
+
+        state.interval = min(max(interval, feed.min_poll_interval), feed.max_poll_interval)
+        self._push(feed, now + state.interval)
+        return state.interval
+
+    def __str__(self) -> str:
+        return self.__class__.__name__
@@ -0,0 +1,134 @@
+# Copyright (c) 2022-2024 Linh Pham
+# mastodon-podcast-bot is released under the terms of the MIT License
+# SPDX-License-Identifier: MIT
+#
+# vim: set noai syntax=python ts=4 sw=4:
+"""Shared testing fixtures."""
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import NamedTuple
+
+import pytest
+
+
+class Response(NamedTuple):
+    """Local HTTP Server Response."""
+
+    status: int = 200
+    headers: dict[str, str] = {}
+    body: bytes = b""
+
+
+class Request(NamedTuple):
+    """Request received by the local HTTP server."""
+
+    method: str
+    path: str
+    headers: dict[str, str]
+    body: bytes
+
+
+def podcast_feed(count: int = 20) -> bytes:
+    """Returns a podcast RSS feed with ``count`` episodes, newest first."""
+    now: datetime = datetime.now().astimezone()
+    items: list[str] = [
+        f"""<item>
+<title>Episode {number}</title>
+<guid>guid-{number}</guid>
+<pubDate>{format_datetime(now - timedelta(days=count - number))}</pubDate>
+<itunes:duration>00:30:00</itunes:duration>
+<description><![CDATA[<p>Notes for episode {number}.</p>]]></description>
+<enclosure url="https://example.org/{number}.mp3" length="1" type="audio/mpeg"/>
+</item>"""
+        for number in range(count, 0, -1)
+    ]
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<rss version="2.0" xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd">'
+        f"<channel><title>Podcast</title>{''.join(items)}</channel></rss>"
+    ).encode()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _respond(self) -> None:
+        length: int = int(self.headers.get("Content-Length", 0))
+        body: bytes = self.rfile.read(length) if length else b""
+        response: Response = self.server.local_server.record(
+            Request(method=self.command, path=self.path, headers=dict(self.headers), body=body)
+        )
+
+        self.send_response(response.status)
+        for name, value in response.headers.items():
+            self.send_header(name, value)
+
+        self.send_header("Content-Length", str(len(response.body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(response.body)
+
+    do_GET = do_HEAD = do_POST = _respond  # noqa: N815
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class LocalServer:
+    """Local HTTP server returning configured responses for each path.
+
+    Each request to a path returns the next response added for that path,
+    and the last response is repeated once the others have been returned.
+    Requests are recorded so that request headers and bodies can be
+    checked.
+    """
+
+    def __init__(self) -> None:
+        self._routes: dict[str, list[Response]] = {}
+        self._lock: Lock = Lock()
+        self.requests: list[Request] = []
+        self._server: ThreadingHTTPServer = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.local_server = self
+        self._thread: Thread = Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add(self, path: str, *responses: Response) -> str:
+        """Add responses for a path, returning the URL of the path."""
+        with self._lock:
+            self._routes.setdefault(path, []).extend(responses)
+
+        return self.url + path
+
+    def record(self, request: Request) -> Response:
+        with self._lock:
+            self.requests.append(request)
+            path: str = request.path.split("?", 1)[0]
+            responses: list[Response] | None = self._routes.get(path) or self._routes.get(
+                path.rstrip("/")
+            )
+            if not responses:
+                return Response(status=404)
+
+            return responses.pop(0) if len(responses) > 1 else responses[0]
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def local_server() -> Iterator[LocalServer]:
+    server: LocalServer = LocalServer()
+    yield server
+    server.close()
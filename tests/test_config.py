@@ -0,0 +1,49 @@
+# Copyright (c) 2022-2024 Linh Pham
+# mastodon-podcast-bot is released under the terms of the MIT License
+# SPDX-License-Identifier: MIT
+#
+# vim: set noai syntax=python ts=4 sw=4:
+"""Testing for config module."""
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from config import AppConfig, FeedIndex, FeedSettings
+
+
+def write_feeds(path: Path, **settings: Any) -> None:
+    feed: dict[str, Any] = {
+        "feed_name": "podcast",
+        "podcast_name": "Podcast",
+        "podcast_feed_url": "https://example.org/feed.xml",
+        "mastodon_api_base_url": "https://mastodon.example.org",
+        "mastodon_secrets_file": "secrets/podcast",
+    }
+    feed.update(settings)
+    (path / "feeds.json").write_text(json.dumps([feed]), encoding="utf-8")
+
+
+def test_parse_tags(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.chdir(tmp_path)
+    write_feeds(tmp_path, tags=["news", " daily "])
+
+    feeds: list[FeedSettings] = AppConfig().parse()
+
+    assert feeds[0].tags == ("news", "daily")
+    assert FeedIndex(feeds).select(tags=["news"]) == feeds
+    assert not FeedIndex(feeds).select(tags=["n"])
+
+
+def test_parse_tags_not_list(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture
+):
+    monkeypatch.chdir(tmp_path)
+    write_feeds(tmp_path, tags="news")
+
+    with pytest.raises(SystemExit) as error:
+        AppConfig().parse()
+
+    assert error.value.code == 1
+    assert "ERROR: Feed tags setting must be a list of tags." in capsys.readouterr().out
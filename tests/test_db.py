@@ -0,0 +1,38 @@
+# Copyright (c) 2022-2024 Linh Pham
+# mastodon-podcast-bot is released under the terms of the MIT License
+# SPDX-License-Identifier: MIT
+#
+# vim: set noai syntax=python ts=4 sw=4:
+"""Testing for db module."""
+from pathlib import Path
+
+import pytest
+
+from db import FeedLeases
+
+
+def test_feed_leases_renew(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    now: list[float] = [1000.0]
+    monkeypatch.setattr("db.time.time", lambda: now[0])
+    lease_db: str = str(tmp_path / "leases.sqlite3")
+    first: FeedLeases = FeedLeases(lease_db, owner="first", ttl=600)
+    second: FeedLeases = FeedLeases(lease_db, owner="second", ttl=600)
+    try:
+        assert first.heartbeat == 200
+        assert first.claim(["daily", "weekly"]) == {"daily", "weekly"}
+        assert not second.claim(["daily", "weekly"])
+
+        # Renewed leases are held past the original expiry time
+        now[0] += first.heartbeat
+        assert first.renew() == 2
+        now[0] += 500
+        assert not second.claim(["daily", "weekly"])
+
+        # Leases that are not renewed expire
+        now[0] += 100
+        assert second.claim(["daily", "weekly"]) == {"daily", "weekly"}
+        assert first.renew() == 0
+        assert not first.claim(["daily"])
+    finally:
+        first.close()
+        second.close()
@@ -0,0 +1,144 @@
+# Copyright (c) 2022-2024 Linh Pham
+# mastodon-podcast-bot is released under the terms of the MIT License
+# SPDX-License-Identifier: MIT
+#
+# vim: set noai syntax=python ts=4 sw=4:
+"""Testing for feed module."""
+import gzip
+import io
+import zlib
+from datetime import datetime, timedelta
+from email.utils import format_datetime
+
+import pytest
+from conftest import LocalServer, Response, podcast_feed
+from podcastparser import FeedParseError
+
+from feed import ConnectionPool, Episode, PodcastFeed, _parse
+
+
+def dated_feed(ages: list[int]) -> bytes:
+    """Returns a podcast RSS feed with an episode for each age, in days, in order."""
+    now: datetime = datetime.now().astimezone()
+    items: str = "".join(
+        f"<item><title>Episode {number}</title><guid>g{number}</guid>"
+        f"<pubDate>{format_datetime(now - timedelta(days=age))}</pubDate>"
+        f'<enclosure url="https://example.org/{number}.mp3" type="audio/mpeg"/></item>'
+        for number, age in enumerate(ages, start=1)
+    )
+    return f'<rss version="2.0"><channel><title>Podcast</title>{items}</channel></rss>'.encode()
+
+
+def raw_deflate(data: bytes) -> bytes:
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def concatenated_gzip(data: bytes) -> bytes:
+    middle: int = len(data) // 2
+    return gzip.compress(data[:middle]) + gzip.compress(data[middle:])
+
+
+_FEED: bytes = podcast_feed()
+
+_BODIES: dict[str, tuple[str | None, bytes]] = {
+    "identity": (None, _FEED),
+    "gzip": ("gzip", gzip.compress(_FEED)),
+    "x-gzip": ("x-gzip", gzip.compress(_FEED)),
+    "deflate": ("deflate", zlib.compress(_FEED)),
+    "raw-deflate": ("deflate", raw_deflate(_FEED)),
+    "concatenated-gzip": ("gzip", concatenated_gzip(_FEED)),
+}
+
+
+def serve_feed(server: LocalServer, name: str) -> str:
+    encoding, body = _BODIES[name]
+    headers: dict[str, str] = {"Content-Type": "application/rss+xml"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+
+    return server.add(f"/{name}.xml", Response(headers=headers, body=body))
+
+
+@pytest.fixture
+def expected_episodes(local_server: LocalServer) -> list[Episode]:
+    return PodcastFeed().fetch(serve_feed(local_server, "identity"), max_episodes=50)
+
+
+@pytest.mark.parametrize("name", list(_BODIES))
+@pytest.mark.parametrize("pooled", [False, True])
+def test_fetch_compressed(
+    local_server: LocalServer, expected_episodes: list[Episode], name: str, pooled: bool
+):
+    feed_url: str = serve_feed(local_server, name)
+    pool: ConnectionPool | None = ConnectionPool() if pooled else None
+    podcast_feed: PodcastFeed = PodcastFeed()
+    try:
+        episodes: list[Episode] = podcast_feed.fetch(feed_url, max_episodes=50, pool=pool)
+    finally:
+        if pool:
+            pool.close()
+
+    assert len(expected_episodes) == 20
+    assert episodes == expected_episodes
+    assert isinstance(episodes[0], Episode)
+    assert episodes[0].title == "Episode 20"
+    assert episodes[0].url == "https://example.org/20.mp3"
+    assert episodes[0].duration == 1800
+
+    # Compressed bytes are counted, not the decompressed feed
+    assert podcast_feed.bytes_downloaded == len(_BODIES[name][1])
+    assert local_server.requests[-1].headers["Accept-Encoding"] == "gzip, deflate"
+
+
+@pytest.mark.parametrize("name", list(_BODIES))
+def test_fetch_compressed_bounded(
+    local_server: LocalServer, expected_episodes: list[Episode], name: str
+):
+    feed_url: str = serve_feed(local_server, name)
+    episodes: list[Episode] = PodcastFeed().fetch(
+        feed_url, max_episodes=5, published_after=datetime.now() - timedelta(days=30)
+    )
+
+    assert episodes == expected_episodes[:5]
+
+
+def test_fetch_truncated_gzip(local_server: LocalServer):
+    body: bytes = gzip.compress(_FEED)
+    feed_url: str = local_server.add(
+        "/truncated.xml",
+        Response(headers={"Content-Encoding": "gzip"}, body=body[: len(body) // 2]),
+    )
+
+    with pytest.raises(FeedParseError):
+        PodcastFeed().fetch(feed_url)
+
+
+@pytest.mark.parametrize(
+    "ages",
+    [
+        [0, 100, 1],
+        [0, 100, 101, 102, 103, 1],
+        [0, 1, 2, 100, 101, 102, 3],
+    ],
+)
+def test_bounded_parse_unsorted(ages: list[int]):
+    feed: bytes = dated_feed(ages)
+    published_after: float = (datetime.now() - timedelta(days=5)).timestamp()
+
+    bounded: list[Episode] = _parse("u", io.BytesIO(feed), 50, published_after)["episodes"]
+    full: list[Episode] = _parse("u", io.BytesIO(feed), 50)["episodes"]
+
+    assert bounded == full
+
+
+def test_bounded_parse_sorted():
+    feed: bytes = dated_feed([0, 1, 100, 101, 102, 103, 104, 105, 106, 107])
+    published_after: float = (datetime.now() - timedelta(days=5)).timestamp()
+
+    bounded: list[Episode] = _parse("u", io.BytesIO(feed), 50, published_after)["episodes"]
+    full: list[Episode] = _parse("u", io.BytesIO(feed), 50)["episodes"]
+
+    # Parsing stops after five consecutive older episodes
+    assert bounded == full[:7]
+    assert _parse("u", io.BytesIO(feed), 3, published_after)["episodes"] == full[:3]
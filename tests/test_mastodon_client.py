@@ -0,0 +1,168 @@
+# Copyright (c) 2022-2024 Linh Pham
+# mastodon-podcast-bot is released under the terms of the MIT License
+# SPDX-License-Identifier: MIT
+#
+# vim: set noai syntax=python ts=4 sw=4:
+"""Testing for mastodon_client module."""
+import json
+import time
+from datetime import datetime, timezone
+
+import pytest
+from conftest import LocalServer, Response
+from mastodon import MastodonRatelimitError, MastodonServerError
+
+from mastodon_client import MastodonClient, PostScheduler
+
+_STATUS: bytes = json.dumps(
+    {"id": "1", "content": "<p>Posted</p>", "created_at": "2024-01-01T00:00:00Z"}
+).encode()
+
+
+class FakeClock:
+    """Clock that only moves forward when sleeping."""
+
+    def __init__(self) -> None:
+        self.now: float = time.time()
+        self.sleeps: list[float] = []
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def rate_limit_headers(limit: int, remaining: int, reset: float) -> dict[str, str]:
+    return {
+        "Content-Type": "application/json",
+        "X-RateLimit-Limit": str(limit),
+        "X-RateLimit-Remaining": str(remaining),
+        "X-RateLimit-Reset": datetime.fromtimestamp(reset, tz=timezone.utc).isoformat(),
+    }
+
+
+def mastodon_client(server: LocalServer) -> MastodonClient:
+    server.add(
+        "/api/v1/instance",
+        Response(headers={"Content-Type": "application/json"}, body=b'{"version": "4.2.0"}'),
+    )
+    return MastodonClient(api_url=server.url, access_token="token")
+
+
+def status_posts(server: LocalServer) -> list:
+    return [
+        request
+        for request in server.requests
+        if request.method == "POST" and request.path == "/api/v1/statuses"
+    ]
+
+
+def test_post_scheduler_syncs_bucket(local_server: LocalServer):
+    clock: FakeClock = FakeClock()
+    reset: float = clock.now + 120
+    local_server.add(
+        "/api/v1/statuses",
+        Response(headers=rate_limit_headers(300, 3, reset), body=_STATUS),
+    )
+    client: MastodonClient = mastodon_client(local_server)
+    scheduler: PostScheduler = PostScheduler(
+        min_interval=0, jitter=0, clock=clock.time, sleep=clock.sleep
+    )
+
+    scheduler.post(client=client, content="First")
+    bucket = scheduler.bucket(client)
+    assert bucket.limit == 300
+    assert bucket.tokens == 3
+    assert bucket.reset == pytest.approx(reset, abs=2)
+    assert not clock.sleeps
+
+    # Fewer than 20% of requests remain, so posts are spread over the
+    # time left until the rate limit window resets
+    scheduler.post(client=client, content="Second")
+    assert clock.sleeps[0] == pytest.approx(120 / 3, abs=2)
+
+
+def test_post_scheduler_retries(local_server: LocalServer):
+    clock: FakeClock = FakeClock()
+    reset: float = clock.now + 120
+    local_server.add(
+        "/api/v1/statuses",
+        Response(
+            status=429,
+            headers=rate_limit_headers(300, 0, reset),
+            body=b'{"error": "Too many requests"}',
+        ),
+        Response(
+            status=503,
+            headers=rate_limit_headers(300, 299, reset + 300),
+            body=b'{"error": "Unavailable"}',
+        ),
+        Response(headers=rate_limit_headers(300, 298, reset + 300), body=_STATUS),
+    )
+    client: MastodonClient = mastodon_client(local_server)
+    scheduler: PostScheduler = PostScheduler(
+        min_interval=0, jitter=0, backoff=2.0, clock=clock.time, sleep=clock.sleep
+    )
+
+    scheduler.post(client=client, content="Episode")
+
+    # Wait until the rate limit resets after a 429, then back off after a
+    # 503 on the second attempt
+    assert len(clock.sleeps) == 2
+    assert clock.sleeps[0] == pytest.approx(120, abs=2)
+    assert clock.sleeps[1] == 4.0
+    assert clock.now >= reset - 2
+    assert scheduler.bucket(client).tokens == 298
+
+    # Every attempt uses the same idempotency key
+    posts = status_posts(local_server)
+    assert len(posts) == 3
+    keys: set[str] = {post.headers["Idempotency-Key"] for post in posts}
+    assert len(keys) == 1
+    assert keys.pop()
+
+
+def test_post_scheduler_gives_up(local_server: LocalServer):
+    clock: FakeClock = FakeClock()
+    local_server.add(
+        "/api/v1/statuses",
+        Response(
+            status=503,
+            headers={"Content-Type": "application/json"},
+            body=b'{"error": "Unavailable"}',
+        ),
+    )
+    client: MastodonClient = mastodon_client(local_server)
+    scheduler: PostScheduler = PostScheduler(
+        min_interval=0, jitter=0, max_retries=2, backoff=2.0, clock=clock.time, sleep=clock.sleep
+    )
+
+    with pytest.raises(MastodonServerError):
+        scheduler.post(client=client, content="Episode")
+
+    assert clock.sleeps == [2.0, 4.0]
+    assert len(status_posts(local_server)) == 3
+
+
+def test_post_scheduler_rate_limit_error(local_server: LocalServer):
+    clock: FakeClock = FakeClock()
+    local_server.add(
+        "/api/v1/statuses",
+        Response(
+            status=429,
+            headers=rate_limit_headers(300, 0, clock.now + 60),
+            body=b'{"error": "Too many requests"}',
+        ),
+    )
+    client: MastodonClient = mastodon_client(local_server)
+    scheduler: PostScheduler = PostScheduler(
+        min_interval=0, jitter=0, max_retries=1, clock=clock.time, sleep=clock.sleep
+    )
+
+    with pytest.raises(MastodonRatelimitError):
+        scheduler.post(client=client, content="Episode")
+
+    assert len(clock.sleeps) == 1
+    assert clock.sleeps[0] == pytest.approx(60, abs=2)
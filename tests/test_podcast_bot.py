@@ -0,0 +1,226 @@
+# Copyright (c) 2022-2024 Linh Pham
+# mastodon-podcast-bot is released under the terms of the MIT License
+# SPDX-License-Identifier: MIT
+#
+# vim: set noai syntax=python ts=4 sw=4:
+"""Testing for podcast_bot module."""
+import hashlib
+import sqlite3
+import time
+from argparse import Namespace
+from pathlib import Path
+
+import pytest
+from conftest import LocalServer, Response, podcast_feed
+
+from command import AppCommand
+from config import FeedSettings
+from db import FeedDatabase, FeedDatabaseRegistry, FeedLeases
+from podcast_bot import FeedRunner
+from scheduler import PollResult
+
+
+def arguments(monkeypatch: pytest.MonkeyPatch, *args: str, dry_run: bool = True) -> Namespace:
+    monkeypatch.setattr("sys.argv", ["podcast_bot.py", *(["--dry-run"] if dry_run else []), *args])
+    return AppCommand().parse()
+
+
+def feed_settings(
+    server: LocalServer,
+    tmp_path: Path,
+    name: str,
+    database_file: str = None,
+    response: Response = None,
+) -> FeedSettings:
+    return FeedSettings(
+        name=name,
+        podcast_name=f"Podcast {name}",
+        feed_url=server.add(f"/{name}.xml", response or Response(body=podcast_feed())),
+        mastodon_use_secrets_file=False,
+        mastodon_api_base_url=server.url,
+        mastodon_access_token="token",
+        database_file=database_file or str(tmp_path / f"{name}.sqlite3"),
+        log_file=str(tmp_path / "podcast_bot.log"),
+        recent_days=90,
+    )
+
+
+@pytest.fixture
+def feeds(local_server: LocalServer, tmp_path: Path) -> list[FeedSettings]:
+    return [
+        feed_settings(local_server, tmp_path, "first"),
+        feed_settings(
+            local_server,
+            tmp_path,
+            "broken",
+            database_file=str(tmp_path / "missing_dir" / "db.sqlite3"),
+        ),
+        feed_settings(local_server, tmp_path, "last"),
+    ]
+
+
+def test_run_isolates_database_errors(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, feeds: list[FeedSettings]
+):
+    with FeedDatabaseRegistry() as databases:
+        runner: FeedRunner = FeedRunner(arguments(monkeypatch), databases=databases)
+        try:
+            results: list[PollResult] = runner.run(feeds, isolate_errors=True)
+        finally:
+            runner.close()
+
+    assert [result.failed for result in results] == [False, True, False]
+    assert len(results[0].published) == 20
+    assert len(results[2].published) == 20
+    assert "unable to open database file" in (tmp_path / "podcast_bot.log").read_text()
+
+
+def test_run_raises_database_errors(monkeypatch: pytest.MonkeyPatch, feeds: list[FeedSettings]):
+    with FeedDatabaseRegistry() as databases:
+        runner: FeedRunner = FeedRunner(arguments(monkeypatch), databases=databases)
+        try:
+            with pytest.raises(sqlite3.OperationalError):
+                runner.run(feeds)
+        finally:
+            runner.close()
+
+
+def test_run_isolates_lease_errors(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, feeds: list[FeedSettings]
+):
+    lease_db: str = str(tmp_path / "leases.sqlite3")
+    with FeedDatabaseRegistry() as databases:
+        runner: FeedRunner = FeedRunner(
+            arguments(monkeypatch, "--lease-db", lease_db), databases=databases
+        )
+        runner.leases.close()
+        runner.leases = FeedLeases(lease_db, owner="worker", busy_timeout=0.1)
+
+        # Another worker holds a write lock on the lease database
+        lock: sqlite3.Connection = sqlite3.connect(lease_db, isolation_level=None)
+        lock.execute("BEGIN IMMEDIATE")
+        try:
+            results: list[PollResult] = runner.run(feeds, isolate_errors=True)
+        finally:
+            lock.execute("ROLLBACK")
+            lock.close()
+
+        try:
+            assert [result.failed for result in results] == [True, True, True]
+
+            # Feeds are processed once the lease database is unlocked
+            results = runner.run(feeds, isolate_errors=True)
+            assert [result.failed for result in results] == [False, True, False]
+        finally:
+            runner.close()
+
+    assert "database is locked" in (tmp_path / "podcast_bot.log").read_text()
+
+
+def test_run_stores_validators_for_unchanged_content(
+    monkeypatch: pytest.MonkeyPatch, local_server: LocalServer, tmp_path: Path
+):
+    body: bytes = podcast_feed()
+    content_hash: str = hashlib.sha256(body).hexdigest()
+    feed: FeedSettings = feed_settings(
+        local_server,
+        tmp_path,
+        "regenerated",
+        response=Response(
+            headers={"ETag": '"v2"', "Last-Modified": "Tue, 01 Oct 2024 00:00:00 GMT"},
+            body=body,
+        ),
+    )
+    database: FeedDatabase = FeedDatabase(feed.database_file)
+    database.store_validators(
+        feed_name=feed.name,
+        feed_url=feed.feed_url,
+        etag='"v1"',
+        last_modified="Sun, 01 Sep 2024 00:00:00 GMT",
+        content_hash=content_hash,
+    )
+    database.close()
+
+    with FeedDatabaseRegistry() as databases:
+        runner: FeedRunner = FeedRunner(arguments(monkeypatch, dry_run=False), databases=databases)
+        try:
+            results: list[PollResult] = runner.run([feed])
+            assert results[0].not_modified
+            assert runner.feed_database(feed).retrieve_validators(
+                feed_name=feed.name, feed_url=feed.feed_url
+            ) == ('"v2"', "Tue, 01 Oct 2024 00:00:00 GMT", content_hash)
+
+            # The next request uses the new validators
+            runner.run([feed])
+        finally:
+            runner.close()
+
+    assert local_server.requests[0].headers["If-None-Match"] == '"v1"'
+    assert local_server.requests[1].headers["If-None-Match"] == '"v2"'
+    assert local_server.requests[1].headers["If-Modified-Since"] == (
+        "Tue, 01 Oct 2024 00:00:00 GMT"
+    )
+
+
+def test_run_renews_leases_during_run(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, feeds: list[FeedSettings]
+):
+    feeds = [feeds[0], feeds[2]]
+    lease_db: str = str(tmp_path / "leases.sqlite3")
+    other: FeedLeases = FeedLeases(lease_db, owner="other", ttl=0.6)
+    with FeedDatabaseRegistry() as databases:
+        runner: FeedRunner = FeedRunner(
+            arguments(monkeypatch, "--lease-db", lease_db, "--lease-ttl", "0.6"),
+            databases=databases,
+        )
+        process = runner.process
+
+        def slow_process(feed: FeedSettings, **kwargs) -> PollResult:
+            # Processing the first feed takes longer than the lease TTL
+            if feed.name == "first":
+                time.sleep(1.0)
+                assert not other.claim(["last"])
+
+            return process(feed=feed, **kwargs)
+
+        monkeypatch.setattr(runner, "process", slow_process)
+        try:
+            results: list[PollResult] = runner.run(feeds, isolate_errors=True)
+        finally:
+            runner.close()
+            other.close()
+
+    assert [result.failed for result in results] == [False, False]
+    assert [len(result.published) for result in results] == [20, 20]
+
+
+def test_run_skips_lost_leases(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, feeds: list[FeedSettings]
+):
+    feeds = [feeds[0], feeds[2]]
+    lease_db: str = str(tmp_path / "leases.sqlite3")
+    other: FeedLeases = FeedLeases(lease_db, owner="other")
+    with FeedDatabaseRegistry() as databases:
+        runner: FeedRunner = FeedRunner(
+            arguments(monkeypatch, "--lease-db", lease_db), databases=databases
+        )
+        process = runner.process
+
+        def expiring_process(feed: FeedSettings, **kwargs) -> PollResult:
+            # The lease on the last feed expires and is claimed by another
+            # worker while the first feed is processed
+            if feed.name == "first":
+                other.connection.execute("UPDATE feed_leases SET expires = 0")
+                assert other.claim(["last"]) == {"last"}
+
+            return process(feed=feed, **kwargs)
+
+        monkeypatch.setattr(runner, "process", expiring_process)
+        try:
+            results: list[PollResult] = runner.run(feeds, isolate_errors=True)
+        finally:
+            runner.close()
+            other.close()
+
+    assert len(results[0].published) == 20
+    assert results[1] == PollResult()